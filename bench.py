@@ -0,0 +1,184 @@
+"""Benchmark suite for the generator hot paths and the end-to-end emit path.
+
+Usage: python bench.py [--records N] [--repeats R] [--startup-runs S] [--output results.json]
+
+Prints one JSON document so runs can be compared between versions. Per benchmark:
+- records_per_sec / ns_per_record: best of `repeats` timed loops of `records` calls
+- p50_ns / p99_ns: latency of individual calls, timed one by one in a separate pass
+- alloc_blocks_per_record: memory blocks each call leaves allocated while its result is kept
+  (CPython has no allocation event counter, so this counts the objects a record produces)
+- peak_alloc_bytes_per_record: mean tracemalloc peak of a single call, i.e. its transient memory
+
+The `emit` benchmark runs emit_random_log through the real export pipeline into an
+in-process OTLP sink that encodes every batch to protobuf but sends nothing.
+
+The `startup` benchmark times the deployed entry point, `python -m loggremlin --help` (the
+image's CMD, which imports the module and parses arguments), in fresh interpreters (median of
+--startup-runs) next to a bare interpreter start and `python loggremlin.py --help`, as
+short-lived jobs, pods and pool workers pay it. One more run has no bytecode cache at all, as a
+container whose image was built without compiling its Python files would.
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+import tracemalloc
+
+from opentelemetry.sdk._logs.export import LogRecordExporter, LogRecordExportResult
+
+import loggremlin
+
+class OTLPSink(LogRecordExporter):
+    """Exporter that encodes each batch like the OTLP exporters do and counts it"""
+
+    def __init__(self):
+        self.records = 0
+        self.bytes = 0
+
+    def export(self, batch):
+        self.bytes += len(loggremlin.encode_batch(batch))
+        self.records += len(batch)
+        return LogRecordExportResult.SUCCESS
+
+    def force_flush(self, timeout_millis=30000):
+        return True
+
+    def shutdown(self):
+        pass
+
+def percentile(samples, q):
+    return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+def measure(fn, records, repeats):
+    best = min(timeit.repeat(fn, number=records, repeat=repeats)) / records
+
+    latencies = []
+    clock = time.perf_counter_ns
+    for _ in range(records):
+        started = clock()
+        fn()
+        latencies.append(clock() - started)
+    latencies.sort()
+
+    gc.collect()
+    blocks = sys.getallocatedblocks()
+    kept = [fn() for _ in range(records)]
+    retained = (sys.getallocatedblocks() - blocks) / records
+    del kept
+
+    tracemalloc.start()
+    peak = 0
+    for _ in range(min(records, 1000)):
+        tracemalloc.reset_peak()
+        current = tracemalloc.get_traced_memory()[0]
+        fn()
+        peak += tracemalloc.get_traced_memory()[1] - current
+    tracemalloc.stop()
+
+    return {
+        'records_per_sec': round(1 / best, 1),
+        'ns_per_record': round(best * 1e9, 1),
+        'p50_ns': percentile(latencies, 0.5),
+        'p99_ns': percentile(latencies, 0.99),
+        'alloc_blocks_per_record': round(retained, 2),
+        'peak_alloc_bytes_per_record': round(peak / min(records, 1000), 1),
+    }
+
+GENERATORS = {
+    'generate_structured_log': loggremlin.generate_structured_log,
+    'generate_unstructured_log': loggremlin.generate_unstructured_log,
+    'generate_multiline_log': loggremlin.generate_multiline_log,
+    'generate_mapping_exception': loggremlin.generate_mapping_exception,
+    'generate_request_flow': loggremlin.generate_request_flow,  # one request: 3-4 records
+    'generate_ip': loggremlin.generate_ip,
+    'generate_internal_ip': loggremlin.generate_internal_ip,
+    'generate_external_ip': loggremlin.generate_external_ip,
+    'generate_timestamp': loggremlin.generate_timestamp,
+}
+
+def bench_emit(records, repeats):
+    """emit_random_log end to end: generation, provider, export pipeline and OTLP encoding"""
+    sink = OTLPSink()
+    # Installed before the first emit so every service's provider feeds this pipeline
+    pipeline = loggremlin.log_record_processor = loggremlin.ExportPipeline(sink, backpressure='block')
+    result = measure(loggremlin.emit_random_log, records, repeats)
+    # emit keeps nothing and the pipeline frees records as it exports them, so only the peak counts
+    del result['alloc_blocks_per_record']
+
+    started = time.perf_counter()
+    for _ in range(records):
+        loggremlin.emit_random_log()
+    pipeline.force_flush()
+    elapsed = time.perf_counter() - started
+    result['end_to_end_records_per_sec'] = round(records / elapsed, 1)
+    result['otlp_bytes_per_record'] = round(sink.bytes / sink.records, 1)
+    counters = pipeline.stats()
+    result['exported'] = counters['exported']
+    result['dropped'] = counters['dropped']
+    pipeline.shutdown()
+    return result
+
+def cold_start_ms(args, runs, env=None):
+    """Median and best wall time of `python *args` in a fresh interpreter"""
+    here = os.path.dirname(os.path.abspath(__file__))
+    times = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, *args], cwd=here, env=env, check=True, stdout=subprocess.DEVNULL)
+        times.append((time.perf_counter() - started) * 1000)
+    return round(statistics.median(times), 1), round(min(times), 1)
+
+def bench_startup(runs):
+    """The entry point's cold start against a bare interpreter start"""
+    interpreter_ms, _ = cold_start_ms(['-c', 'pass'], runs)
+    entry_ms, entry_best_ms = cold_start_ms(['-m', 'loggremlin', '--help'], runs)
+    script_ms, _ = cold_start_ms(['loggremlin.py', '--help'], runs)
+    # An empty cache directory of its own: every module, dependencies included, is compiled from source
+    with tempfile.TemporaryDirectory() as cache:
+        uncached_ms, _ = cold_start_ms(['-m', 'loggremlin', '--help'], 1, dict(os.environ, PYTHONPYCACHEPREFIX=cache))
+    return {
+        'interpreter_ms': interpreter_ms,
+        'entry_ms': entry_ms,
+        'entry_best_ms': entry_best_ms,
+        'entry_only_ms': round(entry_ms - interpreter_ms, 1),
+        'script_ms': script_ms,
+        'uncached_ms': uncached_ms,
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--records', type=int, default=10000, help='calls per timed loop')
+    parser.add_argument('--repeats', type=int, default=5, help='timed loops per benchmark; the best one is reported')
+    parser.add_argument('--startup-runs', type=int, default=10, help='fresh interpreters for the startup benchmark')
+    parser.add_argument('--output', help='also write the JSON results to this file')
+    args = parser.parse_args(argv)
+
+    loggremlin.configure()
+
+    results = {name: measure(fn, args.records, args.repeats) for name, fn in GENERATORS.items()}
+    results['emit'] = bench_emit(args.records, args.repeats)
+    results['startup'] = bench_startup(args.startup_runs)
+    document = json.dumps({
+        'python': platform.python_version(),
+        'shard': loggremlin.SHARD_INDEX,  # `python -m loggremlin merge` sums shards' results
+        'shards': loggremlin.SHARD_COUNT,
+        'records': args.records,
+        'repeats': args.repeats,
+        'json_encoder': loggremlin.JSON_ENCODER,
+        'batch_size': loggremlin.BATCH_SIZE,
+        'benchmarks': results,
+    }, indent=2)
+    print(document)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(document + '\n')
+
+if __name__ == '__main__':
+    main()
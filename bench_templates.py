@@ -0,0 +1,222 @@
+"""Microbenchmark: compiled unstructured templates vs. the previous string-concatenation path.
+
+Usage: python bench_templates.py [lines_per_format] [repeats]
+
+The legacy baseline is the code as it was before the templates, helpers included: it draws
+from the shared `random` module and rejection-samples external IPs. Each figure is the best
+of `repeats` runs, which filters out scheduler noise and the variable cost of those retries.
+"""
+import random
+import sys
+import timeit
+from datetime import datetime
+
+from loggremlin import UNSTRUCTURED_SERVICES, configure, generate_unstructured_log
+
+# The pre-template helpers, as the legacy baseline called them
+
+def generate_ip():
+    return f"{random.randint(0, 255)}.{random.randint(0, 255)}.{random.randint(0, 255)}.{random.randint(0, 255)}"
+
+def generate_internal_ip():
+    range_choice = random.choice([1, 2, 3])
+    if range_choice == 1:
+        return f"10.{random.randint(0, 255)}.{random.randint(0, 255)}.{random.randint(0, 255)}"
+    elif range_choice == 2:
+        return f"172.{random.randint(16, 31)}.{random.randint(0, 255)}.{random.randint(0, 255)}"
+    else:
+        return f"192.168.{random.randint(0, 255)}.{random.randint(0, 255)}"
+
+def generate_external_ip():
+    while True:
+        ip = f"{random.randint(1, 223)}.{random.randint(0, 255)}.{random.randint(0, 255)}.{random.randint(0, 255)}"
+        if not (ip.startswith("10.") or
+                ip.startswith("172.16.") or ip.startswith("172.17.") or ip.startswith("172.18.") or ip.startswith("172.19.") or
+                ip.startswith("172.20.") or ip.startswith("172.21.") or ip.startswith("172.22.") or ip.startswith("172.23.") or
+                ip.startswith("172.24.") or ip.startswith("172.25.") or ip.startswith("172.26.") or ip.startswith("172.27.") or
+                ip.startswith("172.28.") or ip.startswith("172.29.") or ip.startswith("172.30.") or ip.startswith("172.31.") or
+                ip.startswith("192.168.") or
+                ip.startswith("127.") or
+                ip.startswith("0.") or
+                ip.startswith("169.254.") or
+                ip.startswith("224.") or ip.startswith("225.") or ip.startswith("226.") or ip.startswith("227.") or
+                ip.startswith("228.") or ip.startswith("229.") or ip.startswith("230.") or ip.startswith("231.") or
+                ip.startswith("232.") or ip.startswith("233.") or ip.startswith("234.") or ip.startswith("235.") or
+                ip.startswith("236.") or ip.startswith("237.") or ip.startswith("238.") or ip.startswith("239.") or
+                ip.startswith("255.")):
+            return ip
+
+def generate_user_agent():
+    user_agents = [
+        "Mozilla/5.0 (compatible; Googlebot/2.1; +http://www.google.com/bot.html)",
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3",
+        "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/14.0.3 Safari/605.1.15",
+        "Mozilla/5.0 (iPhone; CPU iPhone OS 14_4 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/14.0.3 Mobile/15E148 Safari/604.1",
+        "Mozilla/5.0 (Linux; Android 10; SM-G975F) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/88.0.4324.152 Mobile Safari/537.36",
+        "Mozilla/5.0 (iPad; CPU OS 14_4 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/14.0.3 Mobile/15E148 Safari/604.1"
+    ]
+    return random.choice(user_agents)
+
+def generate_products():
+    products = [
+        "t-shirt",
+        "jeans",
+        "dress",
+        "skirt",
+        "blouse",
+        "sweater",
+        "jacket",
+        "coat",
+        "shorts",
+        "leggings",
+        "suit",
+        "blazer",
+        "hoodie",
+        "cardigan",
+        "tank top",
+        "jumpsuit",
+        "scarf",
+        "hat",
+        "gloves",
+        "socks",
+        "swimwear",
+        "sports bra",
+        "yoga pants",
+        "running shoes",
+        "boots"
+    ]
+    return random.choice(products)
+
+def generate_request_uri():
+    request_uris = [
+        "/users/list",
+        f"/products/details/{random.randint(11111, 99999)}",
+        f"/search/query?term={generate_products()}",
+        f"/api/v1/users/{random.randint(11111, 99999)}/profile",
+        f"/checkout/cart/{random.randint(11111, 99999)}",
+        "/login",
+        "/register/new",
+        f"/settings/user/{random.randint(11111, 99999)}/preferences",
+        f"/images/gallery/album/{random.randint(11111, 99999)}"
+    ]
+    return random.choice(request_uris)
+
+
+def legacy_unstructured_log(service):
+    """The pre-template implementation of generate_unstructured_log, kept as the baseline"""
+    if service == 'ALB':
+        unstructured_log = ""
+        unstructured_log += f"{datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ')} "
+        unstructured_log += f"elb_{random.randint(1, 100)} "
+        unstructured_log += f"{generate_external_ip()}:443 "
+        unstructured_log += f"{generate_internal_ip()}:443 "
+        unstructured_log += f"{random.random()} "
+        unstructured_log += f"{random.random()} "
+        unstructured_log += f"{random.random()} "
+        unstructured_log += f"{random.choice([200, 301, 400, 404, 500])} "
+        unstructured_log += f"{random.choice([200, 301, 400, 404, 500])} "
+        unstructured_log += f"{random.randint(100, 10000)} "
+        unstructured_log += f"{random.randint(100, 10000)} "
+        unstructured_log += f"{random.choice(['GET', 'POST'])} "
+        unstructured_log += f"{generate_request_uri()} "
+        unstructured_log += f"HTTP/1.1 "
+        unstructured_log += f"{generate_user_agent()} "
+        unstructured_log += f"ECDHE-RSA-AES128-GCM-SHA256 "
+        unstructured_log += f"TLSv1.2 "
+        unstructured_log += f"arn:aws:elasticloadbalancing:{random.choice(['us-east-1', 'us-west-2'])}:{random.randint(100000000000, 999999999999)}:targetgroup/{random.choice(['my-target-group', 'your-target-group'])}/{random.randint(1000, 9999)} "
+        unstructured_log += f"Root={random.randint(1, 999999)} "
+        unstructured_log += f"loggoblin.com "
+        unstructured_log += f"arn:aws:acm:region:account-id:certificate/certificate-id "
+        unstructured_log += f"{random.randint(1, 100)} "
+        unstructured_log += f"{datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ')} "
+        unstructured_log += f"forward "
+        unstructured_log += f"- "
+        unstructured_log += f"- "
+        unstructured_log += f"{generate_ip()}:80 "
+        unstructured_log += f"{random.choice([200, 301, 400, 404, 500])} "
+        unstructured_log += f"- "
+        unstructured_log += f"-"
+
+    elif service == 'ELB':
+        unstructured_log = ""
+        unstructured_log += f"{datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ')} "
+        unstructured_log += f"elb_{random.randint(1, 100)} "
+        unstructured_log += f"{generate_internal_ip()}:80 "
+        unstructured_log += f"{generate_internal_ip()}:80 "
+        unstructured_log += f"{random.random()} "
+        unstructured_log += f"{random.random()} "
+        unstructured_log += f"{random.random()} "
+        unstructured_log += f"{random.choice([200, 301, 400, 404, 500])} "
+        unstructured_log += f"{random.choice([200, 301, 400, 404, 500])} "
+        unstructured_log += f"{random.randint(100, 10000)} "
+        unstructured_log += f"{random.randint(100, 10000)} "
+        unstructured_log += f"{random.choice(['GET', 'POST'])} "
+        unstructured_log += f"{generate_request_uri()} "
+        unstructured_log += f"HTTP/1.1 "
+        unstructured_log += f"{generate_user_agent()} "
+        unstructured_log += f"ECDHE-RSA-AES128-GCM-SHA256 "
+        unstructured_log += f"TLSv1.2"
+
+    elif service == 'NGINX':
+        unstructured_log = ""
+        unstructured_log += f"{generate_external_ip()} "
+        unstructured_log += f"- "
+        unstructured_log += f"[{datetime.utcnow().strftime('%d/%b/%Y:%H:%M:%S +0000')}] "
+        unstructured_log += f"\"{random.choice(['GET', 'POST'])} /path/to/resource HTTP/1.1\" "
+        unstructured_log += f"{random.choice([200, 301, 400, 404, 500])} "
+        unstructured_log += f"{random.randint(100, 10000)} "
+        unstructured_log += f"\"-\" "
+        unstructured_log += f"{generate_user_agent()} "
+        unstructured_log += f"{random.random()} "
+        unstructured_log += f"{random.random()} "
+        unstructured_log += f"{random.random()} "
+        unstructured_log += f"{random.random()} "
+        unstructured_log += f"{generate_ip()}"
+
+    else:
+        ip_type = random.choice(['outbound', 'inbound'])
+
+        if ip_type == 'outbound':
+            srcaddr = generate_internal_ip()
+            dstaddr = generate_external_ip()
+        else:
+            srcaddr = generate_external_ip()
+            dstaddr = generate_internal_ip()
+
+        unstructured_log = f"2 "
+        unstructured_log += f"145556732243 "
+        unstructured_log += f"eni-{random.randint(10000000, 99999999)} "
+        unstructured_log += f"{srcaddr} "
+        unstructured_log += f"{dstaddr} "
+        unstructured_log += f"{random.randint(1, 65535)} "
+        unstructured_log += f"{random.randint(1, 65535)} "
+        unstructured_log += f"{random.choice([6, 17])} "
+        unstructured_log += f"{random.randint(1, 1000)} "
+        unstructured_log += f"{random.randint(40, 10000)} "
+        unstructured_log += f"{datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ')} "
+        unstructured_log += f"{datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ')} "
+        unstructured_log += f"{random.choice(['ACCEPT', 'REJECT'])} "
+        unstructured_log += f"{random.choice(['OK', 'NODATA', 'SKIPDATA'])}"
+
+    return service, unstructured_log
+
+
+def lines_per_sec(render, service, lines, repeats):
+    random.seed(0)
+    best = min(timeit.repeat(lambda: render(service), number=lines, repeat=repeats))
+    return lines / best
+
+
+def main():
+    lines = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    configure()
+    print(f"{'format':<8} {'legacy lines/s':>15} {'template lines/s':>17} {'speedup':>8}")
+    for service in UNSTRUCTURED_SERVICES:
+        legacy = lines_per_sec(legacy_unstructured_log, service, lines, repeats)
+        template = lines_per_sec(generate_unstructured_log, service, lines, repeats)
+        print(f"{service:<8} {legacy:>15,.0f} {template:>17,.0f} {template / legacy:>7.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,42 +1,791 @@
+import time
+
+IMPORT_STARTED = time.perf_counter()  # startup timing, see record_startup()
+
+import argparse
+import asyncio
+import bisect
+import collections
+import functools
+import gzip
+import ipaddress
+import itertools
 import json
+import math
+import mmap
+import multiprocessing
 import random
+import signal
+import socket
+import string
+import struct
 import threading
-import time
 import sys
+import uuid
 import os
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 
-# OpenTelemetry imports
+# OpenTelemetry imports. Backends are imported where they are selected: gRPC, the OTLP exporters
+# and the protobuf encoder only load for the sink or transport that uses them, so the module
+# imports quickly and with no side effects (see configure() and main())
 from opentelemetry import _logs
-from opentelemetry.sdk._logs import LoggerProvider
-from opentelemetry.sdk._logs.export import BatchLogRecordProcessor
-from opentelemetry.exporter.otlp.proto.grpc._log_exporter import OTLPLogExporter
+from opentelemetry.sdk._logs import LoggerProvider, LogRecordProcessor, ReadableLogRecord
+from opentelemetry.sdk._logs.export import LogRecordExporter, LogRecordExportResult
 from opentelemetry.sdk.resources import Resource
+from opentelemetry.trace import TraceFlags
+
+# NumPy is optional: batch generation, vectorized sampling and corpus patching use it when present
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Settings are read from the environment at import, but a value that cannot be used never fails
+# the import: it is recorded in setting_problems, naming the variable, the default stands in, and
+# configure() raises everything recorded as one ValueError before anything is generated.
+setting_problems = []
+
+def env_int(name, default):
+    value = os.getenv(name)
+    try:
+        return default if value is None else int(value)
+    except ValueError:
+        setting_problems.append(f"{name} must be an integer, got {value!r}")
+        return default
+
+def env_float(name, default):
+    value = os.getenv(name)
+    try:
+        return default if value is None else float(value)
+    except ValueError:
+        setting_problems.append(f"{name} must be a number, got {value!r}")
+        return default
+
+def env_choice(name, default, choices):
+    value = os.getenv(name, default)
+    if value not in choices:
+        setting_problems.append(f"Unknown {name} {value!r}, expected {', '.join(choices)}")
+        return default
+    return value
+
+def checked_setting(name, build, default):
+    """build(), or `default` with the problem recorded when the setting `name` cannot be used"""
+    try:
+        return build()
+    except (ValueError, ArithmeticError) as error:
+        message = str(error)
+        setting_problems.append(message if name in message else f"{name}: {message}")
+        return default
+
+# Diagnostics: generator self-logging on stderr, separate from the logs we emit over OTLP.
+# TRACE covers the per-record hot path and is off by default; repeated messages sharing a
+# sampling key are rate-limited to DIAG_SAMPLE_RATE lines/sec so error storms stay readable.
+TRACE, DEBUG, INFO, WARNING, ERROR = 5, 10, 20, 30, 40
+DIAG_LEVEL_NAMES = {TRACE: 'TRACE', DEBUG: 'DEBUG', INFO: 'INFO', WARNING: 'WARNING', ERROR: 'ERROR'}
+DIAG_LEVEL = {name: level for level, name in DIAG_LEVEL_NAMES.items()}[
+    env_choice('DIAG_LEVEL', 'INFO', tuple(DIAG_LEVEL_NAMES.values()))]
+DIAG_SAMPLE_RATE = env_float('DIAG_SAMPLE_RATE', 1.0)
+TRACE_ENABLED = DIAG_LEVEL <= TRACE
+
+# sampling key -> [allowance, last refill time, suppressed count]
+diag_samplers = {}
+
+def diag_enabled(level):
+    return level >= DIAG_LEVEL
+
+def diag(level, message, key=None):
+    """Write a diagnostic line to stderr if `level` is enabled; messages with a `key` are sampled"""
+    if level < DIAG_LEVEL:
+        return
+    if key is not None:
+        now = time.monotonic()
+        sampler = diag_samplers.get(key)
+        if sampler is None:
+            sampler = diag_samplers[key] = [DIAG_SAMPLE_RATE, now, 0]
+        sampler[0] = min(DIAG_SAMPLE_RATE, sampler[0] + (now - sampler[1]) * DIAG_SAMPLE_RATE)
+        sampler[1] = now
+        if sampler[0] < 1:
+            sampler[2] += 1
+            return
+        sampler[0] -= 1
+        if sampler[2]:
+            message = f"{message} ({sampler[2]} similar messages suppressed)"
+            sampler[2] = 0
+    print(f"{DIAG_LEVEL_NAMES[level]}: {message}", file=sys.stderr, flush=True)
+
 
 # Initialize OpenTelemetry
 OTEL_HOST = os.getenv('OTEL_HOST', 'localhost')
 OTEL_PORT = os.getenv('OTEL_PORT', '4317')
 
-print(f"Connecting to OTEL at {OTEL_HOST}:{OTEL_PORT}", file=sys.stderr, flush=True)
+# Export pipeline tuning. Records wait in a bounded queue and are exported in batches by
+# EXPORT_CONCURRENCY threads; when the queue is full EXPORT_BACKPRESSURE decides whether new
+# records are dropped (and counted) or the generator blocks until there is room.
+EXPORT_QUEUE_SIZE = env_int('EXPORT_QUEUE_SIZE', 2048)
+EXPORT_BATCH_SIZE = env_int('EXPORT_BATCH_SIZE', 512)
+EXPORT_FLUSH_INTERVAL = env_float('EXPORT_FLUSH_INTERVAL', 1.0)         # seconds before a partial batch is sent
+EXPORT_CONCURRENCY = env_int('EXPORT_CONCURRENCY', 1)                   # export requests in flight at once
+EXPORT_COMPRESSION = env_choice('EXPORT_COMPRESSION', 'none', ('none', 'gzip'))
+EXPORT_BACKPRESSURE = env_choice('EXPORT_BACKPRESSURE', 'drop', ('drop', 'block'))
+EXPORT_MAX_RETRIES = env_int('EXPORT_MAX_RETRIES', 2)                   # re-sends of a failed batch, on top of the exporter's own retries
+
+# Export transport. EXPORT_MODE=sync uses the SDK exporters from export threads; async runs
+# every request as an asyncio task on one event-loop thread, keeping up to EXPORT_CONCURRENCY
+# requests in flight over EXPORT_CONNECTIONS pooled gRPC channels or HTTP keep-alive connections.
+EXPORT_MODE = env_choice('EXPORT_MODE', 'sync', ('sync', 'async'))
+EXPORT_PROTOCOL = env_choice('EXPORT_PROTOCOL', 'grpc', ('grpc', 'http'))  # grpc (OTEL_PORT) | http (OTEL_HTTP_PORT, protobuf)
+OTEL_HTTP_PORT = os.getenv('OTEL_HTTP_PORT', '4318')
+EXPORT_CONNECTIONS = env_int('EXPORT_CONNECTIONS', 1)
+EXPORT_TIMEOUT = env_float('EXPORT_TIMEOUT', 10.0)          # seconds per async export request
+
+# Output sink. SINK=otlp exports to the collector as above; the other sinks write the same records
+# as text lines through the same export pipeline (queue, batching, backpressure, retries and
+# counters), so OTLP receivers and file-tailing collectors can be driven with identical workloads.
+# Each batch is formatted into one buffer and written with a single write call.
+SINK = env_choice('SINK', 'otlp', ('otlp', 'stdout', 'file', 'tcp', 'syslog'))
+SINK_FORMAT = env_choice('SINK_FORMAT', 'raw', ('raw', 'json'))  # raw (the body) | json (JSON lines with resource, severity and trace ids)
+SINK_PATH = os.getenv('SINK_PATH', 'loggremlin.log')        # file: path; pool workers write <name>-<index><ext>
+SINK_MAX_BYTES = env_int('SINK_MAX_BYTES', 104857600)       # file: rotate before exceeding this size; 0 never rotates
+SINK_BACKUPS = env_int('SINK_BACKUPS', 5)                   # file: rotated files kept as SINK_PATH.1 ... SINK_PATH.N
+SINK_ADDRESS = os.getenv('SINK_ADDRESS', 'localhost:514')   # tcp / syslog: host:port
+
+EXPORT_COUNTER_NAMES = ('queued', 'exported', 'dropped', 'failed', 'retried')
+
+# Upper bounds (ms) of the export request latency histogram buckets; the last bucket is open
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+def latency_bucket(seconds):
+    return bisect.bisect_left(LATENCY_BUCKETS_MS, seconds * 1000)
+
+def latency_percentile(counts, q, bounds=LATENCY_BUCKETS_MS):
+    """Upper bound of the bucket holding the q-quantile, or None for an empty histogram"""
+    total = sum(counts)
+    if not total:
+        return None
+    rank = q * total
+    seen = 0
+    for bucket, count in enumerate(counts):
+        seen += count
+        if seen >= rank:
+            return bounds[bucket] if bucket < len(bounds) else float('inf')
+    return float('inf')
+
+def to_readable_log_record(log_record):
+    """Freeze an emitted record so it can be batched and encoded later"""
+    return ReadableLogRecord(
+        log_record=log_record.log_record,
+        resource=log_record.resource,
+        instrumentation_scope=log_record.instrumentation_scope,
+        limits=log_record.limits,
+    )
+
+class ExportPipeline(LogRecordProcessor):
+    """Bounded queue and a pool of export threads in front of one exporter, with counters.
+
+    Every export thread shares the exporter, so concurrent requests are multiplexed over its
+    single gRPC channel.
+    """
+
+    def __init__(self, exporter, queue_size=EXPORT_QUEUE_SIZE, batch_size=EXPORT_BATCH_SIZE,
+                 flush_interval=EXPORT_FLUSH_INTERVAL, concurrency=EXPORT_CONCURRENCY,
+                 backpressure=EXPORT_BACKPRESSURE, max_retries=EXPORT_MAX_RETRIES):
+        if backpressure not in ('drop', 'block'):
+            raise ValueError(f"Unknown EXPORT_BACKPRESSURE {backpressure!r}, expected 'drop' or 'block'")
+        self.exporter = exporter
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.block = backpressure == 'block'
+        self.max_retries = max_retries
+
+        self.queue = collections.deque()
+        self.lock = threading.Lock()
+        self.batch_ready = threading.Condition(self.lock)
+        self.space_available = threading.Condition(self.lock)
+        self.drained = threading.Condition(self.lock)
+        self.in_flight = 0
+        self.flush_requested = False
+        self.shutting_down = False
+        self.aborted = False
+        self.counters = dict.fromkeys(EXPORT_COUNTER_NAMES, 0)
+        self.latency = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.latency_seconds = 0.0
+
+        self.threads = self.start_threads(max(1, concurrency))
+
+    def start_threads(self, concurrency):
+        threads = [threading.Thread(target=self.export_worker, name=f"loggremlin-export-{i}", daemon=True)
+                   for i in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        return threads
+
+    def on_emit(self, log_record):
+        readable_log_record = to_readable_log_record(log_record)
+        with self.lock:
+            if len(self.queue) >= self.queue_size:
+                if not self.block:
+                    self.counters['dropped'] += 1
+                    return
+                while len(self.queue) >= self.queue_size and not self.shutting_down:
+                    self.space_available.wait()
+            if self.shutting_down:
+                self.counters['dropped'] += 1
+                return
+            self.queue.append(readable_log_record)
+            self.counters['queued'] += 1
+            if len(self.queue) == 1 or len(self.queue) >= self.batch_size:
+                self.batch_ready.notify()  # the first record starts the flush interval
+
+    def next_batch(self):
+        """Block until a full batch, a flush or the flush interval; None once shut down and drained or aborted"""
+        with self.lock:
+            while True:
+                if self.aborted:
+                    return None
+                if not self.queue:
+                    if self.shutting_down:
+                        return None
+                    self.batch_ready.wait()  # idle: sleep until a record, a flush of records or shutdown
+                    continue
+                deadline = time.monotonic() + self.flush_interval
+                while len(self.queue) < self.batch_size and not (self.flush_requested or self.shutting_down):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.batch_ready.wait(remaining)
+                if self.queue:
+                    break
+            batch = [self.queue.popleft() for _ in range(min(self.batch_size, len(self.queue)))]
+            self.in_flight += len(batch)
+            self.space_available.notify_all()
+            return batch
+
+    def finish_batch(self, batch):
+        with self.lock:
+            self.in_flight -= len(batch)
+            if not self.queue and not self.in_flight:
+                self.flush_requested = False
+                self.drained.notify_all()
+
+    def record_attempt(self, batch, attempt, seconds):
+        with self.lock:
+            self.latency[latency_bucket(seconds)] += 1
+            self.latency_seconds += seconds
+            if attempt:
+                self.counters['retried'] += len(batch)
+
+    def record_result(self, batch, exported):
+        with self.lock:
+            self.counters['exported' if exported else 'failed'] += len(batch)
+
+    def export_worker(self):
+        while True:
+            batch = self.next_batch()
+            if batch is None:
+                return
+            try:
+                self.export_batch(batch)
+            finally:
+                self.finish_batch(batch)
+
+    def export_batch(self, batch):
+        for attempt in range(self.max_retries + 1):
+            started = time.monotonic()
+            try:
+                result = self.exporter.export(batch)
+            except Exception as e:
+                diag(ERROR, f"Error exporting logs: {type(e).__name__}: {e}", key='export_error')
+                result = None
+            self.record_attempt(batch, attempt, time.monotonic() - started)
+            if result == LogRecordExportResult.SUCCESS:
+                self.record_result(batch, True)
+                return
+            if self.shutting_down:
+                break
+        self.record_result(batch, False)
+
+    def stats(self):
+        """Snapshot of the counters, queue depth, in-flight record count and latency histogram"""
+        with self.lock:
+            return dict(self.counters, queue_depth=len(self.queue), in_flight=self.in_flight,
+                        latency=list(self.latency), latency_seconds=self.latency_seconds)
+
+    def force_flush(self, timeout_millis=30000):
+        deadline = time.monotonic() + timeout_millis / 1000
+        with self.lock:
+            if not self.queue and not self.in_flight:
+                self.flush_requested = False  # nothing to flush; finish_batch would never clear it
+                return True
+            self.flush_requested = True
+            self.batch_ready.notify_all()
+            while self.queue or self.in_flight:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self.drained.wait(remaining)
+        return True
+
+    def abort_exports(self):
+        # Shutting the exporter down aborts its retry backoff, so stragglers fail fast
+        self.exporter.shutdown()
+
+    def shutdown(self, timeout_millis=30000):
+        """Export what is still queued, giving up after timeout_millis"""
+        # Shared by every provider, so only the first shutdown call does the work
+        with self.lock:
+            if self.shutting_down:
+                return
+            self.shutting_down = True
+            self.batch_ready.notify_all()
+            self.space_available.notify_all()
+        deadline = time.monotonic() + timeout_millis / 1000
+        for thread in self.threads:
+            thread.join(max(0.0, deadline - time.monotonic()))
+        with self.lock:
+            self.aborted = True  # past the deadline: take no more batches, what is left counts as failed
+        self.abort_exports()
+        for thread in self.threads:
+            thread.join()
+        with self.lock:
+            self.counters['failed'] += len(self.queue)
+            self.queue.clear()
+
+class AsyncExportPipeline(ExportPipeline):
+    """ExportPipeline whose requests run as asyncio tasks on a single event-loop thread.
+
+    Up to `concurrency` requests are in flight at once, so round-trip time on high-latency
+    links no longer caps throughput the way one blocking request per thread does.
+    """
+
+    def __init__(self, transport, **kwargs):
+        self.transport = transport
+        self.tasks = set()
+        super().__init__(None, **kwargs)
+
+    def start_threads(self, concurrency):
+        self.loop = asyncio.new_event_loop()
+        self.slots = threading.Semaphore(concurrency)
+        # The feeder blocks on the queue's conditions and hands each batch to the event loop
+        threads = [threading.Thread(target=self.run_loop, name="loggremlin-export-loop", daemon=True),
+                   threading.Thread(target=self.feed_batches, name="loggremlin-export-feed", daemon=True)]
+        for thread in threads:
+            thread.start()
+        return threads
+
+    def run_loop(self):
+        self.loop.run_until_complete(self.transport.open())
+        self.loop.run_forever()
+        self.loop.close()
+
+    def feed_batches(self):
+        while True:
+            self.slots.acquire()
+            batch = self.next_batch()
+            if batch is None:
+                break
+            self.loop.call_soon_threadsafe(self.start_send, batch)
+        asyncio.run_coroutine_threadsafe(self.stop_loop(), self.loop).result()
 
-# Create a logger provider (we'll create separate ones for each service.name)
+    def start_send(self, batch):
+        task = self.loop.create_task(self.send(batch))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def stop_loop(self):
+        if self.tasks:
+            await asyncio.gather(*self.tasks, return_exceptions=True)
+        await self.transport.close()
+        self.loop.call_soon(self.loop.stop)
+
+    async def send(self, batch):
+        exported = False
+        try:
+            body = encode_batch(batch)
+            exported = await export_with_retries(self.transport, body, self.max_retries,
+                                                 functools.partial(self.record_attempt, batch),
+                                                 lambda: self.shutting_down)
+        finally:
+            self.record_result(batch, exported)
+            self.finish_batch(batch)
+            self.slots.release()
+
+    def abort_exports(self):
+        def cancel_tasks():
+            for task in list(self.tasks):
+                task.cancel()
+        try:
+            self.loop.call_soon_threadsafe(cancel_tasks)
+        except RuntimeError:
+            pass  # the loop already finished
+
+def encode_batch(batch):
+    """Serialize a batch of ReadableLogRecords into an ExportLogsServiceRequest"""
+    from opentelemetry.exporter.otlp.proto.common._log_encoder import encode_logs
+    return encode_logs(batch).SerializeToString()
+
+class ExportError(Exception):
+    """An export request the receiver rejected; the message is its answer"""
+
+async def export_with_retries(transport, body, max_retries, record_attempt, stopping):
+    """Send one serialized ExportLogsServiceRequest, re-sending with backoff; returns True once accepted.
+
+    record_attempt(attempt, seconds) is called after every attempt; stopping() ends the retries early.
+    """
+    for attempt in range(max_retries + 1):
+        if attempt:
+            await asyncio.sleep(0.1 * 2 ** attempt)
+        started = time.monotonic()
+        try:
+            await transport.export(body)
+            exported = True
+        except ExportError as e:
+            diag(ERROR, f"Error exporting logs: {e}", key='export_error')
+            exported = False
+        except Exception as e:
+            diag(ERROR, f"Error exporting logs: {type(e).__name__}: {e}", key='export_error')
+            exported = False
+        record_attempt(attempt, time.monotonic() - started)
+        if exported or stopping():
+            return exported
+    return False
+
+# Async transports take an already serialized ExportLogsServiceRequest, so pre-encoded
+# corpus batches can be sent without decoding them again
+class AsyncGrpcTransport:
+    """OTLP/gRPC over `connections` grpc.aio channels, used round-robin"""
+
+    def __init__(self, endpoint, connections=EXPORT_CONNECTIONS, compression=EXPORT_COMPRESSION, timeout=EXPORT_TIMEOUT):
+        self.endpoint = endpoint
+        self.connections = max(1, connections)
+        self.compression = compression
+        self.timeout = timeout
+
+    async def open(self):
+        import grpc.aio
+        self.rpc_error = grpc.aio.AioRpcError
+        compression = grpc.Compression.Gzip if self.compression == 'gzip' else grpc.Compression.NoCompression
+        self.channels = [grpc.aio.insecure_channel(self.endpoint, compression=compression)
+                         for _ in range(self.connections)]
+        # No (de)serializers: requests go out as the bytes given and responses are ignored
+        self.calls = itertools.cycle([channel.unary_unary('/opentelemetry.proto.collector.logs.v1.LogsService/Export')
+                                      for channel in self.channels])
+
+    async def export(self, body):
+        try:
+            await next(self.calls)(body, timeout=self.timeout)
+        except self.rpc_error as e:
+            raise ExportError(f"{e.code().name}: {e.details()}") from None
+
+    async def close(self):
+        for channel in self.channels:
+            await channel.close()
+
+async def read_http_response(reader):
+    """Read one HTTP/1.1 response; returns (status, keep_alive) and discards the body"""
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("Connection closed by the receiver")
+    status = int(status_line.split()[1])
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    if headers.get('transfer-encoding', '').lower() == 'chunked':
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            await reader.readexactly(size + 2)  # chunk data and its CRLF; the last chunk is just CRLF
+            if not size:
+                break
+    else:
+        await reader.readexactly(int(headers.get('content-length', '0')))
+    return status, headers.get('connection', '').lower() != 'close'
+
+class AsyncHttpTransport:
+    """OTLP/HTTP protobuf POSTs over a pool of up to `connections` keep-alive connections"""
+
+    def __init__(self, host, port, path='/v1/logs', connections=EXPORT_CONNECTIONS,
+                 compression=EXPORT_COMPRESSION, timeout=EXPORT_TIMEOUT):
+        self.host = host
+        self.port = int(port)
+        self.connections = max(1, connections)
+        self.gzip = compression == 'gzip'
+        self.timeout = timeout
+        self.head = (f"POST {path} HTTP/1.1\r\nHost: {host}:{port}\r\n"
+                     f"Content-Type: application/x-protobuf\r\n"
+                     + ("Content-Encoding: gzip\r\n" if self.gzip else ""))
+
+    async def open(self):
+        # One slot per connection: a caller takes a slot (waiting while all are busy), connects it
+        # if it has no open connection and hands it back, so at most `connections` are ever open
+        self.slots = asyncio.Queue()
+        for _ in range(self.connections):
+            self.slots.put_nowait(None)
+
+    async def export(self, body):
+        if self.gzip:
+            body = gzip.compress(body)
+        connection = await self.slots.get()
+        try:
+            if connection is None:
+                connection = await asyncio.wait_for(asyncio.open_connection(self.host, self.port), self.timeout)
+            reader, writer = connection
+            writer.write(f"{self.head}Content-Length: {len(body)}\r\n\r\n".encode() + body)
+            await writer.drain()
+            status, keep_alive = await asyncio.wait_for(read_http_response(reader), self.timeout)
+            if not keep_alive:
+                writer.close()
+                connection = None
+        except BaseException:
+            if connection is not None:
+                connection[1].close()
+            connection = None
+            raise
+        finally:
+            self.slots.put_nowait(connection)
+        if not 200 <= status < 300:
+            raise ExportError(f"OTLP/HTTP receiver answered {status}")
+
+    async def close(self):
+        while not self.slots.empty():
+            connection = self.slots.get_nowait()
+            if connection is not None:
+                connection[1].close()
+
+# Text sinks. A batch becomes one newline-joined buffer: `raw` lines are the record bodies as an
+# application would print them (multiline bodies stay multiline), `json` lines wrap each record
+# with its timestamp, service.name, severity, trace context and attributes. Syslog frames every
+# record as an RFC 5424 message with octet-counting framing (RFC 6587), so bodies may span lines.
+# Failed writes raise, and the export pipeline counts and retries the batch like a failed export.
+SYSLOG_SEVERITY = (7, 7, 6, 4, 3, 2)  # OTel severity TRACE, DEBUG, INFO, WARN, ERROR, FATAL ranges
+SYSLOG_FACILITY = 16                  # local0
+
+class TextSink(LogRecordExporter):
+    """Exporter writing each batch as text lines in one bulk write; subclasses provide write()"""
+
+    def __init__(self, format=SINK_FORMAT):
+        if format not in ('raw', 'json'):
+            raise ValueError(f"Unknown SINK_FORMAT {format!r}, expected 'raw' or 'json'")
+        self.format_record = raw_line if format == 'raw' else json_line
+        self.lock = threading.Lock()  # export threads share the sink
+
+    def encode(self, batch):
+        return ('\n'.join(map(self.format_record, batch)) + '\n').encode()
+
+    def export(self, batch):
+        data = self.encode(batch)
+        with self.lock:
+            self.write(data)
+        return LogRecordExportResult.SUCCESS
+
+    def force_flush(self, timeout_millis=30000):
+        return True
+
+    def shutdown(self):
+        pass
+
+def raw_line(record):
+    body = record.log_record.body
+    return body if isinstance(body, str) else encode_record(body)
+
+def json_line(record):
+    log_record = record.log_record
+    line = {
+        'time_unix_nano': log_record.timestamp or log_record.observed_timestamp,
+        'service.name': record.resource.attributes.get('service.name'),
+        'severity': log_record.severity_number.name if log_record.severity_number else None,
+        'body': log_record.body,
+    }
+    if log_record.trace_id:
+        line['trace_id'] = f"{log_record.trace_id:032x}"
+        line['span_id'] = f"{log_record.span_id:016x}"
+    if log_record.attributes:
+        line['attributes'] = dict(log_record.attributes)
+    return encode_record(line)
+
+class StdoutSink(TextSink):
+    def __init__(self, format=SINK_FORMAT):
+        super().__init__(format)
+        self.stream = sys.stdout.buffer
+
+    def write(self, data):
+        self.stream.write(data)
+        self.stream.flush()
+
+class FileSink(TextSink):
+    """Appends to `path`, rotating it to path.1 ... path.<backups> before it exceeds max_bytes.
+
+    A batch that does not fit is split at a line boundary, so no file grows past max_bytes
+    unless it holds a single line longer than that.
+    """
+
+    def __init__(self, path, max_bytes=SINK_MAX_BYTES, backups=SINK_BACKUPS, format=SINK_FORMAT):
+        super().__init__(format)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.file = open(path, 'ab', buffering=0)  # writes are whole batches already
+        self.size = self.file.seek(0, os.SEEK_END)
+
+    def write(self, data):
+        while self.max_bytes and self.size + len(data) > self.max_bytes:
+            # The whole lines that still fit, or the first line alone in a fresh file
+            end = data.rfind(b'\n', 0, max(0, self.max_bytes - self.size)) + 1
+            if not end and not self.size:
+                end = data.find(b'\n') + 1 or len(data)
+            if end:
+                self.file.write(data[:end])
+                self.size += end
+                data = data[end:]
+            if not data:
+                return
+            self.rotate()
+        self.file.write(data)
+        self.size += len(data)
+
+    def rotate(self):
+        self.file.close()
+        if self.backups:
+            for index in range(self.backups - 1, 0, -1):
+                if os.path.exists(f"{self.path}.{index}"):
+                    os.replace(f"{self.path}.{index}", f"{self.path}.{index + 1}")
+            os.replace(self.path, f"{self.path}.1")
+        self.file = open(self.path, 'wb', buffering=0)
+        self.size = 0
+
+    def shutdown(self):
+        self.file.close()
+
+class TcpSink(TextSink):
+    """Newline-delimited lines over one TCP connection, reconnecting after a failed write"""
+
+    def __init__(self, address=SINK_ADDRESS, format=SINK_FORMAT):
+        super().__init__(format)
+        host, _, port = address.rpartition(':')
+        self.address = (host or 'localhost', int(port))
+        self.socket = None
+
+    def write(self, data):
+        if self.socket is None:
+            self.socket = socket.create_connection(self.address, timeout=EXPORT_TIMEOUT)
+        try:
+            self.socket.sendall(data)
+        except OSError:
+            self.shutdown()
+            raise
+
+    def shutdown(self):
+        if self.socket is not None:
+            self.socket.close()
+            self.socket = None
+
+class SyslogSink(TcpSink):
+    """RFC 5424 messages over TCP with octet-counting framing; APP-NAME is the service name"""
+
+    def __init__(self, address=SINK_ADDRESS, format=SINK_FORMAT):
+        super().__init__(address, format)
+        self.header = f" {socket.gethostname()}"
+        self.procid = f" {os.getpid()} - - "
+        self.second = None  # cache of the last rendered second
+        self.rendered = None
+
+    def encode(self, batch):
+        frames = []
+        for record in batch:
+            log_record = record.log_record
+            timestamp = log_record.timestamp or log_record.observed_timestamp
+            second, nanos = divmod(timestamp, 1_000_000_000)
+            if second != self.second:
+                self.second = second
+                self.rendered = time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(second))
+            severity = SYSLOG_SEVERITY[min(5, (log_record.severity_number.value - 1) // 4)] if log_record.severity_number else 6
+            message = (f"<{SYSLOG_FACILITY * 8 + severity}>1 {self.rendered}.{nanos // 1000:06d}Z{self.header} "
+                       f"{record.resource.attributes.get('service.name', '-')}{self.procid}{self.format_record(record)}").encode()
+            frames.append(b'%d %b' % (len(message), message))
+        return b''.join(frames)
+
+def create_sink(worker=None):
+    if SINK == 'stdout':
+        return StdoutSink()
+    if SINK == 'file':
+        if worker is None:
+            return FileSink(SINK_PATH)
+        root, ext = os.path.splitext(SINK_PATH)
+        return FileSink(f"{root}-{worker}{ext}")
+    if SINK == 'tcp':
+        return TcpSink()
+    if SINK == 'syslog':
+        return SyslogSink()
+    raise ValueError(f"Unknown SINK {SINK!r}, expected otlp, stdout, file, tcp or syslog")
+
+# One LoggerProvider per service.name (the resource differs), but a single export pipeline
+# shared by all of them: one ExportPipeline feeding one exporter (one gRPC channel, or one
+# pool of connections in async mode). The OTLP encoder groups each batch by resource, so
+# records from different services go out together in one ExportLogsServiceRequest with one
+# ResourceLogs per service, and adding services adds no threads, sockets or small batches.
 logger_providers = {}
+log_record_processor = None
+
+def otlp_endpoint():
+    return f"{OTEL_HOST}:{OTEL_HTTP_PORT if EXPORT_PROTOCOL == 'http' else OTEL_PORT}"
+
+def create_async_transport():
+    if EXPORT_PROTOCOL == 'http':
+        return AsyncHttpTransport(OTEL_HOST, OTEL_HTTP_PORT)
+    return AsyncGrpcTransport(f"{OTEL_HOST}:{OTEL_PORT}")
+
+def create_log_record_processor(worker=None):
+    if SINK != 'otlp':
+        return ExportPipeline(create_sink(worker))
+    if EXPORT_MODE == 'async':
+        return AsyncExportPipeline(create_async_transport())
+    if EXPORT_PROTOCOL == 'http':
+        from opentelemetry.exporter.otlp.proto.http import Compression as HttpCompression
+        from opentelemetry.exporter.otlp.proto.http._log_exporter import OTLPLogExporter as OTLPHttpLogExporter
+        exporter = OTLPHttpLogExporter(
+            endpoint=f"http://{OTEL_HOST}:{OTEL_HTTP_PORT}/v1/logs",
+            compression=HttpCompression.Gzip if EXPORT_COMPRESSION == 'gzip' else HttpCompression.NoCompression,
+        )
+    else:
+        import grpc
+        from opentelemetry.exporter.otlp.proto.grpc._log_exporter import OTLPLogExporter
+        exporter = OTLPLogExporter(
+            endpoint=f"{OTEL_HOST}:{OTEL_PORT}",
+            insecure=True,
+            compression=grpc.Compression.Gzip if EXPORT_COMPRESSION == 'gzip' else grpc.Compression.NoCompression,
+        )
+    return ExportPipeline(exporter)
+
+def get_log_record_processor():
+    """Get or create the export pipeline shared by every service's provider"""
+    global log_record_processor
+    if log_record_processor is None:
+        log_record_processor = create_log_record_processor()
+    return log_record_processor
+
+def export_stats():
+    """Export pipeline counters, or all zeros before the pipeline exists"""
+    if log_record_processor is None:
+        return dict(dict.fromkeys(EXPORT_COUNTER_NAMES, 0), queue_depth=0, in_flight=0,
+                    latency=[0] * (len(LATENCY_BUCKETS_MS) + 1), latency_seconds=0.0)
+    return log_record_processor.stats()
 
 def get_logger_for_service(service_name):
     """Get or create a logger with the appropriate service.name resource attribute"""
     if service_name not in logger_providers:
         # Create resource with service.name
-        resource = Resource.create({"service.name": service_name})
+        attributes = {"service.name": service_name}
+        if SEED is not None:
+            # The SDK gives every process a random service.instance.id; a seeded run derives it
+            attributes["service.instance.id"] = str(uuid.uuid5(uuid.NAMESPACE_URL, f"loggremlin/{SEED}/{seed_stream}/{service_name}"))
+        resource = Resource.create(attributes)
         
-        # Create logger provider with this resource
+        # Create logger provider with this resource, exporting through the shared pipeline
         provider = LoggerProvider(resource=resource)
-        
-        # Add OTLP exporter
-        exporter = OTLPLogExporter(
-            endpoint=f"{OTEL_HOST}:{OTEL_PORT}",
-            insecure=True
-        )
-        provider.add_log_record_processor(BatchLogRecordProcessor(exporter))
+        provider.add_log_record_processor(get_log_record_processor())
         
         # Get logger from this provider
         logger = provider.get_logger(__name__)
@@ -44,95 +793,399 @@ def get_logger_for_service(service_name):
     
     return logger_providers[service_name][1]
 
+# Sharding: SHARD_COUNT replicas generate one cluster-wide load. Rates (TARGET_RATE, the rate
+# profile or a scenario's phases) are global and each shard sends 1/SHARD_COUNT of them, and
+# request, trace and ENI ids, internal and generic addresses and external client addresses are
+# drawn from disjoint per-shard slices, so no two replicas emit the same id or address. In a
+# StatefulSet, SHARD_INDEX defaults to the pod ordinal that ends the hostname.
+def statefulset_ordinal():
+    """The ordinal ending a StatefulSet pod's hostname, e.g. 3 for loggremlin-3, or None"""
+    ordinal = socket.gethostname().rpartition('-')[2]
+    return int(ordinal) if ordinal.isdigit() else None
+
+def shard_config():
+    """(SHARD_COUNT, SHARD_INDEX) from the environment, or a ValueError naming the bad setting"""
+    count, index = os.getenv('SHARD_COUNT', '1'), os.getenv('SHARD_INDEX')
+    if not count.isdigit() or not 1 <= int(count) <= 256:
+        raise ValueError(f"SHARD_COUNT must be an integer from 1 to 256, got {count!r}")
+    count = int(count)
+    if not index:
+        if count == 1:
+            return 1, 0
+        index = statefulset_ordinal()
+        if index is None:
+            raise ValueError(f"SHARD_COUNT={count} needs SHARD_INDEX: hostname {socket.gethostname()!r} "
+                             f"has no StatefulSet ordinal to default it to")
+    elif not index.isdigit():
+        raise ValueError(f"SHARD_INDEX must be an integer, got {index!r}")
+    if not 0 <= int(index) < count:
+        raise ValueError(f"SHARD_INDEX must be from 0 to {count - 1} with SHARD_COUNT={count}, got {index}")
+    return count, int(index)
+
+# 1-256 replicas sharing TARGET_RATE; until configure() reports a bad setting, this process acts as the only shard
+SHARD_COUNT, SHARD_INDEX = checked_setting('SHARD', shard_config, (1, 0))
+# Third octets of this shard's internal and generic addresses
+SHARD_OCTETS = range(SHARD_INDEX, 256, SHARD_COUNT)
+
+def shard_range(low, high):
+    """This shard's contiguous slice of the integers low..high, as (low, high)"""
+    span = high - low + 1
+    return low + span * SHARD_INDEX // SHARD_COUNT, low + span * (SHARD_INDEX + 1) // SHARD_COUNT - 1
+
+# Random streams. Generators draw from `rand` and the NumPy paths from `batch_rng`, never from
+# the shared `random` module state. Both are reseeded in place, so samplers and templates that
+# hold their bound methods follow along. With SEED set a run is reproducible: import-time setup
+# uses the seed's setup stream, then each worker switches to its own stream split off the seed
+# by worker index (and shard index when sharded), so a seed and a worker count give the same
+# records every time and no two workers repeat each other.
+# Unseeded, every stream starts from OS entropy.
+SEED = env_int('SEED', None)  # non-negative integer; unset seeds from OS entropy
+if SEED is not None and SEED < 0:
+    setting_problems.append(f"SEED must be a non-negative integer, got {SEED}")
+    SEED = None
+
+rand = random.Random()
+batch_rng = np.random.default_rng() if np is not None else None
+
+def seed_streams(worker=None):
+    """Reseed rand and batch_rng for `worker`'s stream, or the setup stream when None"""
+    global seed_stream
+    seed_stream = 'setup' if worker is None else worker
+    spawn_key = () if worker is None else (worker,)
+    if SHARD_COUNT > 1 and worker is not None:
+        # Shards share the setup stream but not their workers' streams
+        seed_stream = f"shard-{SHARD_INDEX}/{worker}"
+        spawn_key = (SHARD_COUNT, SHARD_INDEX, worker)
+    if SEED is None:
+        rand.seed()
+    else:
+        rand.seed(f"loggremlin/{SEED}/{seed_stream}")
+    if np is not None:
+        sequence = np.random.SeedSequence(SEED, spawn_key=spawn_key)
+        batch_rng.bit_generator.state = np.random.PCG64(sequence).state
+
+seed_streams()
 
 def generate_ip():
-    return f"{random.randint(0, 255)}.{random.randint(0, 255)}.{random.randint(0, 255)}.{random.randint(0, 255)}"
+    return f"{rand.randint(0, 255)}.{rand.randint(0, 255)}.{rand.choice(SHARD_OCTETS)}.{rand.randint(0, 255)}"
 
 def generate_internal_ip():
-    range_choice = random.choice([1, 2, 3])
+    range_choice = rand.choice([1, 2, 3])
     if range_choice == 1:
-        return f"10.{random.randint(0, 255)}.{random.randint(0, 255)}.{random.randint(0, 255)}"
+        return f"10.{rand.randint(0, 255)}.{rand.choice(SHARD_OCTETS)}.{rand.randint(0, 255)}"
     elif range_choice == 2:
-        return f"172.{random.randint(16, 31)}.{random.randint(0, 255)}.{random.randint(0, 255)}"
+        return f"172.{rand.randint(16, 31)}.{rand.choice(SHARD_OCTETS)}.{rand.randint(0, 255)}"
     else:
-        return f"192.168.{random.randint(0, 255)}.{random.randint(0, 255)}"
+        return f"192.168.{rand.choice(SHARD_OCTETS)}.{rand.randint(0, 255)}"
+
+# External (public) addresses are drawn from a precomputed table of allowed ranges: a uniform
+# index into the total address count is mapped to its range with a binary search over the
+# cumulative range sizes, so there is no generate-and-reject loop. Optionally a share of draws
+# comes from a fixed pool of "hot" addresses to model realistic client cardinality; the pool is
+# seeded so every worker shares the same hot set. A shard draws from its own slice of the
+# address index space, hot set included.
+DEFAULT_EXTERNAL_IP_INCLUDE = '0.0.0.0/0'
+DEFAULT_EXTERNAL_IP_EXCLUDE = '0.0.0.0/8,10.0.0.0/8,127.0.0.0/8,169.254.0.0/16,172.16.0.0/12,192.168.0.0/16,224.0.0.0/3'
+EXTERNAL_IP_INCLUDE = os.getenv('EXTERNAL_IP_INCLUDE', DEFAULT_EXTERNAL_IP_INCLUDE)
+EXTERNAL_IP_EXCLUDE = os.getenv('EXTERNAL_IP_EXCLUDE', DEFAULT_EXTERNAL_IP_EXCLUDE)
+EXTERNAL_IP_POOL_SIZE = env_int('EXTERNAL_IP_POOL_SIZE', 0)               # 0 draws every address from the full table
+EXTERNAL_IP_POOL_SHARE = env_float('EXTERNAL_IP_POOL_SHARE', 1.0)         # fraction of draws served from the pool
+EXTERNAL_IP_POOL_SEED = env_int('EXTERNAL_IP_POOL_SEED', 0)
+
+def parse_cidrs(value):
+    return [ipaddress.IPv4Network(cidr.strip()) for cidr in value.split(',') if cidr.strip()]
+
+def format_ipv4(address):
+    return socket.inet_ntoa(address.to_bytes(4, 'big'))
+
+class AddressSampler:
+    """Uniform sampler over the IPv4 addresses in `include` that are not in `exclude`"""
+
+    def __init__(self, include, exclude, pool_size=0, pool_share=1.0, pool_seed=0, shard_index=0, shard_count=1):
+        ranges = []  # disjoint, sorted [first, last] address pairs
+        for network in sorted(include, key=lambda network: int(network.network_address)):
+            first, last = int(network.network_address), int(network.broadcast_address)
+            if ranges and first <= ranges[-1][1] + 1:
+                ranges[-1][1] = max(ranges[-1][1], last)
+            else:
+                ranges.append([first, last])
+        for network in exclude:
+            cut_first, cut_last = int(network.network_address), int(network.broadcast_address)
+            remaining = []
+            for first, last in ranges:
+                if last < cut_first or first > cut_last:
+                    remaining.append([first, last])
+                    continue
+                if first < cut_first:
+                    remaining.append([first, cut_first - 1])
+                if last > cut_last:
+                    remaining.append([cut_last + 1, last])
+            ranges = remaining
+        if not ranges:
+            raise ValueError("EXTERNAL_IP_INCLUDE and EXTERNAL_IP_EXCLUDE leave no addresses to sample")
+
+        self.starts = [first for first, _ in ranges]
+        self.ends = []  # cumulative address count up to and including each range
+        total = 0
+        for first, last in ranges:
+            total += last - first + 1
+            self.ends.append(total)
+        self.total = total
+        self.offset = total * shard_index // shard_count  # first index of this shard's slice
+        self.span = total * (shard_index + 1) // shard_count - self.offset
+
+        pool_rng = random.Random(pool_seed)
+        self.pool = tuple(format_ipv4(self.address_at(self.offset + pool_rng.randrange(self.span)))
+                          for _ in range(pool_size))
+        self.pool_share = pool_share if self.pool else 0.0
+
+    def address_at(self, index):
+        """The index-th allowed address, as an integer"""
+        position = bisect.bisect_right(self.ends, index)
+        return self.starts[position] + index - (self.ends[position - 1] if position else 0)
+
+    def sample(self):
+        if self.pool_share and rand.random() < self.pool_share:
+            return rand.choice(self.pool)
+        return format_ipv4(self.address_at(self.offset + rand.randrange(self.span)))
+
+    def sample_octets(self, rng, n):
+        """n addresses as an (n, 4) octet array, drawn with a NumPy generator"""
+        index = rng.integers(self.offset, self.offset + self.span, n)
+        position = np.searchsorted(np.array(self.ends), index, side='right')
+        range_offset = np.concatenate(([0], self.ends[:-1]))[position]
+        addresses = np.array(self.starts)[position] + index - range_offset
+        if self.pool_share:
+            hot = rng.random(n) < self.pool_share
+            pool = np.array([int(ipaddress.IPv4Address(address)) for address in self.pool])
+            addresses[hot] = pool[rng.integers(0, len(pool), int(hot.sum()))]
+        return (addresses[:, None] >> np.array([24, 16, 8, 0])) & 255
+
+def external_ip_sampler_for(include, exclude):
+    return AddressSampler(parse_cidrs(include), parse_cidrs(exclude), EXTERNAL_IP_POOL_SIZE, EXTERNAL_IP_POOL_SHARE,
+                          EXTERNAL_IP_POOL_SEED, SHARD_INDEX, SHARD_COUNT)
+
+# A bad range list falls back to the default ranges until configure() reports it
+external_ip_sampler = checked_setting('EXTERNAL_IP_INCLUDE/EXCLUDE',
+                                      lambda: external_ip_sampler_for(EXTERNAL_IP_INCLUDE, EXTERNAL_IP_EXCLUDE), None)
+if external_ip_sampler is None:
+    external_ip_sampler = external_ip_sampler_for(DEFAULT_EXTERNAL_IP_INCLUDE, DEFAULT_EXTERNAL_IP_EXCLUDE)
 
 def generate_external_ip():
-    while True:
-        ip = f"{random.randint(1, 223)}.{random.randint(0, 255)}.{random.randint(0, 255)}.{random.randint(0, 255)}"
-        if not (ip.startswith("10.") or
-                ip.startswith("172.16.") or ip.startswith("172.17.") or ip.startswith("172.18.") or ip.startswith("172.19.") or
-                ip.startswith("172.20.") or ip.startswith("172.21.") or ip.startswith("172.22.") or ip.startswith("172.23.") or
-                ip.startswith("172.24.") or ip.startswith("172.25.") or ip.startswith("172.26.") or ip.startswith("172.27.") or
-                ip.startswith("172.28.") or ip.startswith("172.29.") or ip.startswith("172.30.") or ip.startswith("172.31.") or
-                ip.startswith("192.168.") or
-                ip.startswith("127.") or
-                ip.startswith("0.") or
-                ip.startswith("169.254.") or
-                ip.startswith("224.") or ip.startswith("225.") or ip.startswith("226.") or ip.startswith("227.") or
-                ip.startswith("228.") or ip.startswith("229.") or ip.startswith("230.") or ip.startswith("231.") or
-                ip.startswith("232.") or ip.startswith("233.") or ip.startswith("234.") or ip.startswith("235.") or
-                ip.startswith("236.") or ip.startswith("237.") or ip.startswith("238.") or ip.startswith("239.") or
-                ip.startswith("255.")):
-            return ip
+    return external_ip_sampler.sample()
+
+# Weighted choices. Every categorical field is drawn through an AliasSampler, uniform by
+# default; a scenario file (SCENARIO_FILE) reloads the weights in place, so functions and
+# compiled templates holding a sampler pick up new weights without being rebuilt.
+def alias_tables(weights):
+    """Vose's alias tables: (probability, alias) per column, for O(1) weighted draws"""
+    n = len(weights)
+    total = sum(weights)
+    if not n or total <= 0 or min(weights) < 0:
+        raise ValueError(f"Weights must be non-negative with a positive sum, got {weights!r}")
+    scaled = [weight * n / total for weight in weights]
+    prob = [1.0] * n
+    alias = list(range(n))
+    small = [i for i, p in enumerate(scaled) if p < 1]
+    large = [i for i, p in enumerate(scaled) if p >= 1]
+    while small and large:
+        less, more = small.pop(), large.pop()
+        prob[less] = scaled[less]
+        alias[less] = more
+        scaled[more] += scaled[less] - 1
+        (small if scaled[more] < 1 else large).append(more)
+    return prob, alias
+
+class AliasSampler:
+    """Weighted choice over a fixed set of values with one random draw per sample"""
+
+    def __init__(self, values, weights=None):
+        self.defaults = tuple(values)
+        self.default_weights = weights
+        self.load(self.defaults, weights)
+
+    def load(self, values, weights=None):
+        values = tuple(values)
+        if weights is None:
+            if not values:
+                raise ValueError("A sampler needs at least one value")
+            prob, alias = [1.0] * len(values), list(range(len(values)))  # uniform: never take the alias
+        else:
+            prob, alias = alias_tables(list(weights))
+        self.values, self.prob, self.alias, self.n = values, prob, alias, len(values)
+        self.budget = None  # (values, zipf) when loaded with a cardinality budget
+        if np is not None:
+            self.value_table = np.array(values, dtype=object)
+            self.prob_table = np.ones(self.n) if weights is None else np.array(prob)
+            self.alias_table = np.arange(self.n) if weights is None else np.array(alias)
+
+    def reset(self):
+        self.load(self.defaults, self.default_weights)
+
+    def sample(self):
+        u = rand.random() * self.n
+        i = int(u)
+        return self.values[i] if u - i < self.prob[i] else self.values[self.alias[i]]
+
+    def draw(self, rng, n):
+        """n samples as a list, drawn with NumPy"""
+        u = rng.random(n) * self.n
+        column = u.astype(np.intp)
+        column = np.where(u - column < self.prob_table[column], column, self.alias_table[column])
+        return self.value_table[column].tolist()
+
+class RangeSampler(AliasSampler):
+    """Uniform integer in [low, high] (an ID-like field) until a cardinality budget loads a value pool.
+    A sharded field draws from this shard's slice of the range and gets its share of a budgeted pool."""
+
+    def __init__(self, low, high, sharded=False):
+        self.full = (low, high)
+        self.sharded = sharded
+        self.low, self.high = shard_range(low, high) if sharded else (low, high)
+        self.defaults = None
+        self.reset()
+
+    def reset(self):
+        self.values = None
+        self.budget = None
+
+    def sample(self):
+        if self.values is None:
+            return rand.randint(self.low, self.high)
+        return AliasSampler.sample(self)
+
+    def draw(self, rng, n):
+        if self.values is None:
+            return rng.integers(self.low, self.high + 1, n).tolist()
+        return AliasSampler.draw(self, rng, n)
+
+LOG_LEVELS = ('DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL')
+log_level_sampler = AliasSampler(LOG_LEVELS)
 
 def generate_log_level():
-    return random.choice(['DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL'])
+    return log_level_sampler.sample()
+
+USER_AGENTS = (
+    "Mozilla/5.0 (compatible; Googlebot/2.1; +http://www.google.com/bot.html)",
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3",
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/14.0.3 Safari/605.1.15",
+    "Mozilla/5.0 (iPhone; CPU iPhone OS 14_4 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/14.0.3 Mobile/15E148 Safari/604.1",
+    "Mozilla/5.0 (Linux; Android 10; SM-G975F) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/88.0.4324.152 Mobile Safari/537.36",
+    "Mozilla/5.0 (iPad; CPU OS 14_4 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/14.0.3 Mobile/15E148 Safari/604.1"
+)
+
+user_agent_sampler = AliasSampler(USER_AGENTS)
 
 def generate_user_agent():
-    user_agents = [
-        "Mozilla/5.0 (compatible; Googlebot/2.1; +http://www.google.com/bot.html)",
-        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3",
-        "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/14.0.3 Safari/605.1.15",
-        "Mozilla/5.0 (iPhone; CPU iPhone OS 14_4 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/14.0.3 Mobile/15E148 Safari/604.1",
-        "Mozilla/5.0 (Linux; Android 10; SM-G975F) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/88.0.4324.152 Mobile Safari/537.36",
-        "Mozilla/5.0 (iPad; CPU OS 14_4 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/14.0.3 Mobile/15E148 Safari/604.1"
-    ]
-    return random.choice(user_agents)
+    return user_agent_sampler.sample()
+
+PRODUCTS = (
+    "t-shirt",
+    "jeans",
+    "dress",
+    "skirt",
+    "blouse",
+    "sweater",
+    "jacket",
+    "coat",
+    "shorts",
+    "leggings",
+    "suit",
+    "blazer",
+    "hoodie",
+    "cardigan",
+    "tank top",
+    "jumpsuit",
+    "scarf",
+    "hat",
+    "gloves",
+    "socks",
+    "swimwear",
+    "sports bra",
+    "yoga pants",
+    "running shoes",
+    "boots"
+)
+
+product_sampler = AliasSampler(PRODUCTS)
 
 def generate_products():
-    products = [
-        "t-shirt",
-        "jeans",
-        "dress",
-        "skirt",
-        "blouse",
-        "sweater",
-        "jacket",
-        "coat",
-        "shorts",
-        "leggings",
-        "suit",
-        "blazer",
-        "hoodie",
-        "cardigan",
-        "tank top",
-        "jumpsuit",
-        "scarf",
-        "hat",
-        "gloves",
-        "socks",
-        "swimwear",
-        "sports bra",
-        "yoga pants",
-        "running shoes",
-        "boots"
-    ]
-    return random.choice(products)
+    return product_sampler.sample()
+
+REQUEST_URI_PATTERNS = (
+    "/users/list",
+    "/products/details/{id}",
+    "/search/query?term={product}",
+    "/api/v1/users/{id}/profile",
+    "/checkout/cart/{id}",
+    "/login",
+    "/register/new",
+    "/settings/user/{id}/preferences",
+    "/images/gallery/album/{id}"
+)
+
+request_id_sampler = RangeSampler(11111, 99999, sharded=True)
 
 def generate_request_uri():
-    request_uris = [
-        "/users/list",
-        f"/products/details/{random.randint(11111, 99999)}",
-        f"/search/query?term={generate_products()}",
-        f"/api/v1/users/{random.randint(11111, 99999)}/profile",
-        f"/checkout/cart/{random.randint(11111, 99999)}",
-        "/login",
-        "/register/new",
-        f"/settings/user/{random.randint(11111, 99999)}/preferences",
-        f"/images/gallery/album/{random.randint(11111, 99999)}"
-    ]
-    return random.choice(request_uris)
+    return rand.choice(REQUEST_URI_PATTERNS).format(id=request_id_sampler.sample(), product=generate_products())
+
+# Event time. Rendered timestamps are cached per format and re-rendered only when the second
+# (or, for %f formats, the millisecond) changes, so a record costs a clock read and a dict
+# lookup instead of a strftime per field. CLOCK_MODE=virtual replaces the system clock with
+# event time starting at CLOCK_START and advancing CLOCK_STEP seconds per emitted record, for
+# back-dated or accelerated time without reading the system clock per record.
+CLOCK_MODE = env_choice('CLOCK_MODE', 'system', ('system', 'virtual'))
+CLOCK_START = os.getenv('CLOCK_START')  # virtual: ISO 8601 start time, e.g. 2024-06-18T12:00:00Z (default: now)
+CLOCK_STEP = env_float('CLOCK_STEP', 0.001)
+
+EPOCH = datetime(1970, 1, 1)  # naive UTC, as rendered timestamps carry no zone
+
+def parse_utc_time(value):
+    """Epoch nanoseconds for an ISO 8601 time; naive times are taken as UTC"""
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return (parsed - EPOCH) // timedelta(microseconds=1) * 1000
+
+class Clock:
+    """System or virtual event-time source with cached strftime rendering.
+
+    Time is kept in integer nanoseconds, so a virtual clock advances by exact steps instead
+    of accumulating float rounding.
+    """
+
+    def __init__(self, virtual=False, start_ns=None, step=0.001):
+        self.virtual = virtual
+        self.current_ns = start_ns if start_ns is not None else time.time_ns()
+        self.step_ns = round(step * 1e9)
+        self.cache = {}  # format -> [cache key, rendered string, nanoseconds per key]
+
+    def now_ns(self):
+        return self.current_ns if self.virtual else time.time_ns()
+
+    def tick(self):
+        """Advance virtual time by one record; a no-op on the system clock"""
+        if self.virtual:
+            self.current_ns += self.step_ns
+
+    def timestamp_ns(self):
+        """LogRecord timestamp and observed timestamp to emit with: virtual event time, or None to let the SDK stamp them"""
+        return self.current_ns if self.virtual else None
+
+    def format(self, fmt):
+        now_ns = self.now_ns()
+        entry = self.cache.get(fmt)
+        if entry is None:
+            entry = self.cache[fmt] = [None, None, 1_000_000 if '%f' in fmt else 1_000_000_000]
+        key = now_ns // entry[2]
+        if key != entry[0]:
+            entry[0] = key
+            entry[1] = (EPOCH + timedelta(microseconds=now_ns // 1000)).strftime(fmt)
+        return entry[1]
+
+clock = Clock(CLOCK_MODE == 'virtual',
+              checked_setting('CLOCK_START', lambda: parse_utc_time(CLOCK_START), None) if CLOCK_START else None,
+              CLOCK_STEP)
 
 def generate_timestamp():
     timestamp_formats = [
@@ -141,110 +1194,326 @@ def generate_timestamp():
         '%Y-%m-%dT%H:%M:%SZ',    # e.g., 2024-06-18T12:00:00Z
         '%b %d, %Y %H:%M:%S %p', # e.g., Jun 18, 2024 12:00:00 PM
     ]
-    format_choice = random.choice(timestamp_formats)
-    timestamp = datetime.utcnow().strftime(format_choice)
+    format_choice = rand.choice(timestamp_formats)
+    timestamp = clock.format(format_choice)
     if '%f' in format_choice:
         return timestamp[:-3]  # Trim microseconds to milliseconds if present
     return timestamp
 
+def size_drawer(mean, dist, spread, setting):
+    """A function drawing sizes from `dist` around `mean`, `spread` being the relative standard deviation"""
+    if dist == 'fixed':
+        return lambda: mean
+    if dist == 'uniform':
+        half_width = mean * spread * math.sqrt(3)
+        return lambda: int(rand.uniform(mean - half_width, mean + half_width))
+    if dist == 'normal':
+        return lambda: int(rand.gauss(mean, mean * spread))
+    if dist == 'lognormal':
+        sigma = math.sqrt(math.log(1 + spread ** 2))
+        mu = math.log(mean) - sigma ** 2 / 2
+        return lambda: int(rand.lognormvariate(mu, sigma))
+    if dist == 'exponential':
+        return lambda: int(rand.expovariate(1 / mean))
+    raise ValueError(f"Unknown {setting} {dist!r}, expected fixed, uniform, normal, lognormal or exponential")
+
+# Multiline records: stack traces as Java, Python, Go, Node.js and .NET print them, plus short
+# generic warnings with a few frames. Each exception's depth is drawn from MULTILINE_DEPTH_DIST
+# around MULTILINE_DEPTH frames, and with MULTILINE_CAUSE_RATE it has a cause, rendered the way
+# its runtime prints chains ("Caused by:", chained tracebacks, inner exceptions, [cause], wrapped
+# errors). Headers, exception lines and frames are rendered once per format into a pool standing
+# for one application's code base (the same every run, whatever the SEED), and a stack is a
+# window of that pool, so a 100-frame trace costs one slice and one join.
+MULTILINE_FORMATS = tuple(os.getenv('MULTILINE_FORMATS', 'java,python,go,node,dotnet,generic').split(','))
+MULTILINE_DEPTH = env_int('MULTILINE_DEPTH', 8)                           # mean frames per exception
+MULTILINE_DEPTH_DIST = os.getenv('MULTILINE_DEPTH_DIST', 'lognormal')     # fixed | uniform | normal | lognormal | exponential
+MULTILINE_DEPTH_SPREAD = env_float('MULTILINE_DEPTH_SPREAD', 1.0)
+MULTILINE_MAX_DEPTH = env_int('MULTILINE_MAX_DEPTH', 256)
+MULTILINE_CAUSE_RATE = env_float('MULTILINE_CAUSE_RATE', 0.3)             # chance that an exception has a cause
+MULTILINE_MAX_CAUSES = env_int('MULTILINE_MAX_CAUSES', 4)
+MULTILINE_FRAME_POOL = env_int('MULTILINE_FRAME_POOL', 1024)              # distinct frames per format
+
+FRAME_DOMAINS = ('order', 'payment', 'invoice', 'cart', 'product', 'account', 'session', 'shipment', 'search', 'report')
+FRAME_ROLES = ('Service', 'Controller', 'Repository', 'Client', 'Handler', 'Validator', 'Mapper', 'Cache', 'Worker', 'Gateway')
+FRAME_VERBS = ('get', 'find', 'load', 'save', 'update', 'validate', 'process', 'handle', 'execute', 'resolve', 'fetch')
+
+JAVA_FRAME = "    at com.example.{domain}.{noun}{role}.{verb}{noun}({noun}{role}.java:{line})"
+
+# Per format: first-line headers (after the timestamp), exception lines, one frame and an
+# optional outermost frame, as str.format templates over frame_fields()
+MULTILINE_TEMPLATES = {
+    'java': {
+        'headers': ('Exception in thread "main" ',
+                    'ERROR [http-nio-8080-exec-{n}] com.example.{domain}.{noun}Controller - Request failed\n'),
+        'exceptions': ('java.lang.NullPointerException: Cannot invoke "{noun}.getId()" because "{domain}" is null',
+                       'java.lang.IllegalStateException: {noun} {id} is not in a valid state',
+                       'java.lang.IllegalArgumentException: {domain}Id cannot be null',
+                       'java.sql.SQLTransientConnectionException: HikariPool-1 - Connection is not available, '
+                       'request timed out after 30000ms.',
+                       'java.net.SocketTimeoutException: Read timed out',
+                       'java.net.ConnectException: Connection refused: {ip}:5432',
+                       'com.example.{domain}.{noun}NotFoundException: {noun} {id} not found'),
+        'frame': JAVA_FRAME,
+        'tail': "    at java.base/java.lang.Thread.run(Thread.java:833)",
+    },
+    'python': {
+        'headers': ('', 'ERROR Exception in ASGI application\n'),
+        'exceptions': ('ValueError: invalid literal for int() with base 10: \'{domain}-{id}\'',
+                       'KeyError: \'{domain}_id\'',
+                       'AttributeError: \'NoneType\' object has no attribute \'{verb}_{domain}\'',
+                       'TimeoutError: timed out after {n} seconds',
+                       'ConnectionRefusedError: [Errno 111] Connection refused',
+                       'app.{domain}.errors.{noun}NotFound: {noun} {id} not found'),
+        'frame': '  File "/app/{domain}/{module}.py", line {line}, in {verb}_{domain}\n'
+                 '    return self.{module}.{verb}_{domain}({domain}_id)',
+    },
+    'go': {
+        'headers': ('panic: ', 'http: panic serving {ip}:{port}: '),
+        'exceptions': ('runtime error: invalid memory address or nil pointer dereference',
+                       'runtime error: index out of range [{n}] with length {n}',
+                       '{verb} {domain} {id}',
+                       'dial tcp {ip}:5432: connect: connection refused',
+                       'context deadline exceeded',
+                       '{domain} {id} not found'),
+        'frame': "example.com/app/internal/{domain}.(*{noun}{role}).{Verb}{noun}(0xc000{address:06x}, 0x{offset:x})\n"
+                 "\t/app/internal/{domain}/{module}.go:{line} +0x{pc:x}",
+        'tail': "created by net/http.(*Server).Serve in goroutine 1\n"
+                "\t/usr/local/go/src/net/http/server.go:3086 +0x5cb",
+    },
+    'node': {
+        'headers': ('', 'ERROR Unhandled rejection\n'),
+        'exceptions': ("TypeError: Cannot read properties of undefined (reading '{domain}Id')",
+                       'Error: connect ECONNREFUSED {ip}:5432',
+                       'Error: {noun} {id} not found',
+                       'RangeError: Maximum call stack size exceeded',
+                       'SyntaxError: Unexpected token < in JSON at position {n}'),
+        'frame': "    at {async}{noun}{role}.{verb}{noun} (/app/src/{domain}/{module}.js:{line}:{column})",
+    },
+    'dotnet': {
+        'headers': ('', 'fail: Microsoft.AspNetCore.Diagnostics.ExceptionHandlerMiddleware[1]\n'
+                        '      An unhandled exception has occurred while executing the request.\n'),
+        'exceptions': ('System.NullReferenceException: Object reference not set to an instance of an object.',
+                       'System.InvalidOperationException: {noun} {id} is not in a valid state',
+                       'System.ArgumentException: Value cannot be null. (Parameter \'{domain}Id\')',
+                       'System.TimeoutException: The operation has timed out.',
+                       'Microsoft.Data.SqlClient.SqlException (0x80131904): Execution Timeout Expired.',
+                       'Example.{noun}.{noun}NotFoundException: {noun} {id} not found'),
+        'frame': "   at Example.{noun}.{noun}{role}.{Verb}{noun}Async(Int32 {domain}Id) in "
+                 "/src/{noun}/{noun}{role}.cs:line {line}",
+    },
+    'generic': {
+        'headers': ('WARN [com.example.{domain}.{noun}{role}] Possible issue detected',),
+        'exceptions': ('',),
+        'frame': JAVA_FRAME,
+    },
+}
+
+def frame_fields(rng):
+    """Names and numbers for one rendering of a template"""
+    domain = rng.choice(FRAME_DOMAINS)
+    role = rng.choice(FRAME_ROLES)
+    verb = rng.choice(FRAME_VERBS)
+    return {'domain': domain, 'noun': domain.title(), 'role': role, 'module': role.lower(), 'verb': verb,
+            'Verb': verb.title(), 'line': rng.randint(10, 900), 'column': rng.randint(5, 80),
+            'id': rng.randint(1000, 99999), 'n': rng.randint(1, 200), 'ip': f"10.0.{rng.randint(0, 255)}.{rng.randint(1, 254)}",
+            'port': rng.randint(32768, 60999), 'address': rng.randrange(16 ** 6), 'offset': rng.randrange(4096), 'pc': rng.randrange(4096),
+            'async': 'async ' if rng.random() < 0.3 else ''}
+
+class FramePool:
+    """Pre-rendered, interned headers, exception lines and frames of one multiline format"""
+
+    def __init__(self, name, size=MULTILINE_FRAME_POOL):
+        templates = MULTILINE_TEMPLATES[name]
+        rng = random.Random(f"loggremlin/frames/{name}")
+        def render(template, count):
+            return [sys.intern(template.format(**frame_fields(rng))) for _ in range(count)]
+        self.headers = [line for template in templates['headers'] for line in render(template, 16)]
+        self.exceptions = [line for template in templates['exceptions'] for line in render(template, 16)]
+        self.frames = render(templates['frame'], max(size, MULTILINE_MAX_DEPTH))
+        self.tail = templates.get('tail')
+
+    def header(self):
+        return rand.choice(self.headers)
+
+    def stack(self, depth):
+        """`depth` consecutive frames, innermost first"""
+        start = rand.randrange(len(self.frames) - depth + 1)
+        return self.frames[start:start + depth]
+
+    def chain(self):
+        """Exception lines from the outermost exception to its innermost cause"""
+        chain = [rand.choice(self.exceptions)]
+        while len(chain) <= MULTILINE_MAX_CAUSES and rand.random() < MULTILINE_CAUSE_RATE:
+            chain.append(rand.choice(self.exceptions))
+        return chain
+
+# Built on first use, so importing the module stays cheap
+frame_pools = {}
+
+def frame_pool(name):
+    pool = frame_pools.get(name)
+    if pool is None:
+        pool = frame_pools[name] = FramePool(name)
+    return pool
+
+unknown_formats = set(MULTILINE_FORMATS) - set(MULTILINE_TEMPLATES)
+if unknown_formats:
+    setting_problems.append(f"Unknown MULTILINE_FORMATS {', '.join(sorted(unknown_formats))}, "
+                            f"expected some of {', '.join(MULTILINE_TEMPLATES)}")
+    MULTILINE_FORMATS = tuple(MULTILINE_TEMPLATES)
+draw_multiline_depth = checked_setting(
+    'MULTILINE_DEPTH_DIST',
+    lambda: size_drawer(MULTILINE_DEPTH, MULTILINE_DEPTH_DIST, MULTILINE_DEPTH_SPREAD, 'MULTILINE_DEPTH_DIST'),
+    lambda: MULTILINE_DEPTH)
+multiline_format_sampler = AliasSampler(MULTILINE_FORMATS)
+
+def draw_depth():
+    return min(MULTILINE_MAX_DEPTH, max(1, draw_multiline_depth()))
+
 def generate_multiline_log():
-    multiline_log_types = [
-        generate_java_stack_trace,
-        generate_python_traceback,
-        generate_timestamped_error,
-        generate_generic_multiline_log
-    ]
-    
-    log_generator = random.choice(multiline_log_types)
-    return log_generator()
+    return MULTILINE_GENERATORS[multiline_format_sampler.sample()]()
 
 def generate_java_stack_trace():
-    stack_trace = [
-        f'{generate_timestamp()} Exception in thread "main" java.lang.NullPointerException',
-        '    at com.example.myproject.Book.getTitle(Book.java:16)',
-        '    at com.example.myproject.Author.getBookTitles(Author.java:25)',
-        '    at com.example.myproject.Bootstrap.main(Bootstrap.java:14)'
-    ]
-    return '\n'.join(stack_trace)
+    pool = frame_pool('java')
+    chain = pool.chain()
+    depth = draw_depth()
+    lines = [f"{generate_timestamp()} {pool.header()}{chain[0]}", *pool.stack(depth), pool.tail]
+    for cause in chain[1:]:
+        # A cause's frames end where they join the enclosing trace, which Java elides
+        cause_depth = draw_depth()
+        lines.append(f"Caused by: {cause}")
+        lines += pool.stack(cause_depth)
+        lines.append(f"    ... {rand.randint(1, depth)} more")
+        depth = cause_depth
+    return '\n'.join(lines)
 
 def generate_python_traceback():
-    traceback = [
-        f'{generate_timestamp()} Traceback (most recent call last):',
-        '  File "<stdin>", line 1, in <module>',
-        '  File "<string>", line 2, in <module>',
-        'ValueError: math domain error'
-    ]
-    return '\n'.join(traceback)
-
-def generate_timestamped_error():
-    error_log = [
-        f'{generate_timestamp()} ERROR [com.example.MyClass] Something went wrong',
-        'java.lang.IllegalArgumentException: argument cannot be null',
-        '    at com.example.MyClass.method(MyClass.java:50)',
-        '    at com.example.MyClass.main(MyClass.java:30)'
-    ]
-    return '\n'.join(error_log)
+    pool = frame_pool('python')
+    lines = []
+    for exception in reversed(pool.chain()):  # Python prints the innermost cause first
+        if lines:
+            lines.append("\nThe above exception was the direct cause of the following exception:\n")
+        lines.append("Traceback (most recent call last):")
+        lines += pool.stack(draw_depth())
+        lines.append(exception)
+    return f"{generate_timestamp()} {pool.header()}" + '\n'.join(lines)
+
+def generate_go_panic():
+    pool = frame_pool('go')
+    lines = [f"{generate_timestamp()} {pool.header()}{': '.join(pool.chain())}", "",  # causes are wrapped errors
+             f"goroutine {rand.randint(1, 5000)} [running]:", *pool.stack(draw_depth()), pool.tail]
+    return '\n'.join(lines)
+
+def generate_node_error():
+    pool = frame_pool('node')
+    chain = pool.chain()
+    lines = [f"{generate_timestamp()} {pool.header()}{chain[0]}", *pool.stack(draw_depth())]
+    indent = ''
+    for cause in chain[1:]:
+        lines[-1] += ' {'
+        indent += '  '
+        lines.append(f"{indent}[cause]: {cause}")
+        lines += [indent + frame for frame in pool.stack(draw_depth())]
+    for level in range(len(chain) - 2, -1, -1):
+        lines.append('  ' * level + '}')
+    return '\n'.join(lines)
+
+def generate_dotnet_exception():
+    pool = frame_pool('dotnet')
+    chain = pool.chain()
+    lines = [f"{generate_timestamp()} {pool.header()}{chain[0]}"]
+    lines += [f" ---> {inner}" for inner in chain[1:]]
+    for level in range(len(chain) - 1, -1, -1):  # innermost frames first
+        lines += pool.stack(draw_depth())
+        if level:
+            lines.append("   --- End of inner exception stack trace ---")
+    return '\n'.join(lines)
 
 def generate_generic_multiline_log():
-    warn_log = [
-        f'{generate_timestamp()} WARN [com.example.MyClass] Possible issue detected',
-        '    at com.example.MyClass.method(MyClass.java:40)',
-        '    at com.example.MyClass.main(MyClass.java:20)'
-    ]
-    return '\n'.join(warn_log)
+    pool = frame_pool('generic')
+    return '\n'.join([f"{generate_timestamp()} {pool.header()}", *pool.stack(draw_depth())])
+
+MULTILINE_GENERATORS = {
+    'java': generate_java_stack_trace,
+    'python': generate_python_traceback,
+    'go': generate_go_panic,
+    'node': generate_node_error,
+    'dotnet': generate_dotnet_exception,
+    'generic': generate_generic_multiline_log,
+}
 
-def generate_structured_log():
-    service = random.choice(['ALB', 'ELB', 'NGINX', 'VPCFLOW'])
+STATUS_CODES = (200, 301, 400, 404, 500)
+HTTP_METHODS = ('GET', 'POST')
+REGIONS = ('us-east-1', 'us-west-2')
+FLOW_PROTOCOLS = (6, 17)
+FLOW_ACTIONS = ('ACCEPT', 'REJECT')
+STRUCTURED_SERVICES = ('ALB', 'ELB', 'NGINX', 'VPCFLOW')
+
+status_code_sampler = AliasSampler(STATUS_CODES)
+http_method_sampler = AliasSampler(HTTP_METHODS)
+region_sampler = AliasSampler(REGIONS)
+flow_protocol_sampler = AliasSampler(FLOW_PROTOCOLS)
+flow_action_sampler = AliasSampler(FLOW_ACTIONS)
+structured_service_sampler = AliasSampler(STRUCTURED_SERVICES)
+elb_id_sampler = RangeSampler(1, 100)
+account_id_sampler = RangeSampler(100000000000, 999999999999)
+target_group_id_sampler = RangeSampler(1000, 9999)
+trace_id_sampler = RangeSampler(1, 999999, sharded=True)
+interface_id_sampler = RangeSampler(10000000, 99999999, sharded=True)
+
+def generate_structured_log(service=None):
+    if service is None:
+        service = structured_service_sampler.sample()
 
     log_data = {}
 
     if service == 'ALB':
         log_data.update({
-            'time': datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ'),
-            'elb': f"elb_{random.randint(1, 100)}",
+            'time': clock.format('%Y-%m-%dT%H:%M:%SZ'),
+            'elb': f"elb_{elb_id_sampler.sample()}",
             'client': f"{generate_external_ip()}:443",
             'target': f"{generate_internal_ip()}:443",
-            'request_processing_time': random.random(),
-            'target_processing_time': random.random(),
-            'response_processing_time': random.random(),
-            'elb_status_code': random.choice([200, 301, 400, 404, 500]),
-            'target_status_code': random.choice([200, 301, 400, 404, 500]),
-            'received_bytes': random.randint(100, 10000),
-            'sent_bytes': random.randint(100, 10000),
-            'request_method': random.choice(['GET', 'POST']),
+            'request_processing_time': rand.random(),
+            'target_processing_time': rand.random(),
+            'response_processing_time': rand.random(),
+            'elb_status_code': status_code_sampler.sample(),
+            'target_status_code': status_code_sampler.sample(),
+            'received_bytes': rand.randint(100, 10000),
+            'sent_bytes': rand.randint(100, 10000),
+            'request_method': http_method_sampler.sample(),
             'request_uri': f"{generate_request_uri()}",
             'target_protocol': 'HTTP/1.1',
             'user_agent': f"{generate_user_agent()}",
             'ssl_cipher': 'ECDHE-RSA-AES128-GCM-SHA256',
             'ssl_protocol': 'TLSv1.2',
-            'target_group_arn': f"arn:aws:elasticloadbalancing:{random.choice(['us-east-1', 'us-west-2'])}:{random.randint(100000000000, 999999999999)}:targetgroup/{random.choice(['my-target-group', 'your-target-group'])}/{random.randint(1000, 9999)}",
-            'trace_id': f"Root={random.randint(1, 999999)}",
+            'target_group_arn': f"arn:aws:elasticloadbalancing:{region_sampler.sample()}:{account_id_sampler.sample()}:targetgroup/{rand.choice(['my-target-group', 'your-target-group'])}/{target_group_id_sampler.sample()}",
+            'trace_id': f"Root={trace_id_sampler.sample()}",
             'domain_name': 'example.com',
             'chosen_cert_arn': 'arn:aws:acm:region:account-id:certificate/certificate-id',
-            'matched_rule_priority': str(random.randint(1, 100)),
-            'request_creation_time': datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ'),
+            'matched_rule_priority': str(rand.randint(1, 100)),
+            'request_creation_time': clock.format('%Y-%m-%dT%H:%M:%SZ'),
             'actions_executed': 'forward',
             'redirect_url': '-',
             'error_reason': '-',
             'target_port_list': f"{generate_ip()}:80",
-            'target_status_code_list': str(random.choice([200, 301, 400, 404, 500])),
+            'target_status_code_list': str(status_code_sampler.sample()),
             'classification': '-',
             'classification_reason': '-',
         })
     elif service == 'ELB':
         log_data.update({
-            'time': datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ'),
-            'elb': f"elb_{random.randint(1, 100)}",
+            'time': clock.format('%Y-%m-%dT%H:%M:%SZ'),
+            'elb': f"elb_{elb_id_sampler.sample()}",
             'client': f"{generate_external_ip()}:80",
             'backend': f"{generate_internal_ip()}:80",
-            'request_processing_time': random.random(),
-            'backend_processing_time': random.random(),
-            'response_processing_time': random.random(),
-            'elb_status_code': random.choice([200, 301, 400, 404, 500]),
-            'backend_status_code': random.choice([200, 301, 400, 404, 500]),
-            'received_bytes': random.randint(100, 10000),
-            'sent_bytes': random.randint(100, 10000),
-            'request_method': random.choice(['GET', 'POST']),
+            'request_processing_time': rand.random(),
+            'backend_processing_time': rand.random(),
+            'response_processing_time': rand.random(),
+            'elb_status_code': status_code_sampler.sample(),
+            'backend_status_code': status_code_sampler.sample(),
+            'received_bytes': rand.randint(100, 10000),
+            'sent_bytes': rand.randint(100, 10000),
+            'request_method': http_method_sampler.sample(),
             'request_uri': f"{generate_request_uri()}",
             'target_protocol': 'HTTP/1.1',
             'user_agent': f"{generate_user_agent()}",
@@ -255,20 +1524,20 @@ def generate_structured_log():
         log_data.update({
             'remote_addr': generate_external_ip(),
             'remote_user': '-', 
-            'time_local': datetime.utcnow().strftime('%d/%b/%Y:%H:%M:%S +0000'),
-            'request': f"{random.choice(['GET', 'POST'])} /path/to/resource HTTP/1.1",
-            'status': random.choice([200, 301, 400, 404, 500]),
-            'body_bytes_sent': random.randint(100, 10000),
+            'time_local': clock.format('%d/%b/%Y:%H:%M:%S +0000'),
+            'request': f"{http_method_sampler.sample()} /path/to/resource HTTP/1.1",
+            'status': status_code_sampler.sample(),
+            'body_bytes_sent': rand.randint(100, 10000),
             'http_referer': '-',
             'http_user_agent': 'Mozilla/5.0 (compatible; Googlebot/2.1; +http://www.google.com/bot.html)',
-            'request_time': random.random(),
-            'upstream_connect_time': random.random(),
-            'upstream_header_time': random.random(),
-            'upstream_response_time': random.random(),
+            'request_time': rand.random(),
+            'upstream_connect_time': rand.random(),
+            'upstream_header_time': rand.random(),
+            'upstream_response_time': rand.random(),
             'upstream_ip': generate_ip(),
         })
     elif service == 'VPCFLOW':
-        ip_type = random.choice(['outbound', 'inbound'])
+        ip_type = rand.choice(['outbound', 'inbound'])
 
         if ip_type == 'outbound':
             srcaddr = generate_internal_ip()
@@ -280,121 +1549,378 @@ def generate_structured_log():
         log_data.update({
             'version': 2,
             'account_id': 145556732243,
-            'interface_id': f"eni-{random.randint(10000000, 99999999)}",
+            'interface_id': f"eni-{interface_id_sampler.sample()}",
             'srcaddr': srcaddr,
             'dstaddr': dstaddr,
-            'srcport': random.randint(1, 65535),
-            'dstport': random.randint(1, 65535),
-            'protocol': random.choice([6, 17]), 
-            'packets': random.randint(1, 1000),
-            'bytes': random.randint(40, 10000),
-            'start': datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ'),
-            'end': datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ'),
-            'action': random.choice(['ACCEPT', 'REJECT']),
-            'log_status': random.choice(['OK', 'NODATA', 'SKIPDATA']),
+            'srcport': rand.randint(1, 65535),
+            'dstport': rand.randint(1, 65535),
+            'protocol': flow_protocol_sampler.sample(),
+            'packets': rand.randint(1, 1000),
+            'bytes': rand.randint(40, 10000),
+            'start': clock.format('%Y-%m-%dT%H:%M:%SZ'),
+            'end': clock.format('%Y-%m-%dT%H:%M:%SZ'),
+            'action': flow_action_sampler.sample(),
+            'log_status': rand.choice(['OK', 'NODATA', 'SKIPDATA']),
         })
 
-    return service, json.dumps(log_data)
+    return service, log_data
 
-def generate_unstructured_log():
-    unstructured_log = ""
-    service = random.choice(['ALB', 'ELB', 'NGINX', 'VPCFLOW'])
+# Batch generation: draw every numeric field for n structured records at once as NumPy arrays
+# (status codes, byte counts, ports, processing times, IP octets, ...). Each field is a column
+# of n values; a record is assembled from one row only when it is rendered, which is also when
+# its timestamps are taken. NumPy is optional and only needed for this path.
+class RenderTime:
+    """Column placeholder for a timestamp formatted when the record is rendered"""
 
-    if service == 'ALB':
-        unstructured_log = ""
-        unstructured_log += f"{datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ')} "
-        unstructured_log += f"elb_{random.randint(1, 100)} "
-        unstructured_log += f"{generate_external_ip()}:443 "
-        unstructured_log += f"{generate_internal_ip()}:443 "
-        unstructured_log += f"{random.random()} "
-        unstructured_log += f"{random.random()} "
-        unstructured_log += f"{random.random()} "
-        unstructured_log += f"{random.choice([200, 301, 400, 404, 500])} "
-        unstructured_log += f"{random.choice([200, 301, 400, 404, 500])} "
-        unstructured_log += f"{random.randint(100, 10000)} "
-        unstructured_log += f"{random.randint(100, 10000)} "
-        unstructured_log += f"{random.choice(['GET', 'POST'])} "
-        unstructured_log += f"{generate_request_uri()} "
-        unstructured_log += f"HTTP/1.1 "
-        unstructured_log += f"{generate_user_agent()} "
-        unstructured_log += f"ECDHE-RSA-AES128-GCM-SHA256 "
-        unstructured_log += f"TLSv1.2 "
-        unstructured_log += f"arn:aws:elasticloadbalancing:{random.choice(['us-east-1', 'us-west-2'])}:{random.randint(100000000000, 999999999999)}:targetgroup/{random.choice(['my-target-group', 'your-target-group'])}/{random.randint(1000, 9999)} "
-        unstructured_log += f"Root={random.randint(1, 999999)} "
-        unstructured_log += f"loggoblin.com "
-        unstructured_log += f"arn:aws:acm:region:account-id:certificate/certificate-id "
-        unstructured_log += f"{random.randint(1, 100)} "
-        unstructured_log += f"{datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ')} "
-        unstructured_log += f"forward "
-        unstructured_log += f"- "
-        unstructured_log += f"- "
-        unstructured_log += f"{generate_ip()}:80 "
-        unstructured_log += f"{random.choice([200, 301, 400, 404, 500])} "
-        unstructured_log += f"- "
-        unstructured_log += f"-"
+    def __init__(self, fmt):
+        self.fmt = fmt
 
-    elif service == 'ELB':
-        unstructured_log = ""
-        unstructured_log += f"{datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ')} "
-        unstructured_log += f"elb_{random.randint(1, 100)} "
-        unstructured_log += f"{generate_internal_ip()}:80 "
-        unstructured_log += f"{generate_internal_ip()}:80 "
-        unstructured_log += f"{random.random()} "
-        unstructured_log += f"{random.random()} "
-        unstructured_log += f"{random.random()} "
-        unstructured_log += f"{random.choice([200, 301, 400, 404, 500])} "
-        unstructured_log += f"{random.choice([200, 301, 400, 404, 500])} "
-        unstructured_log += f"{random.randint(100, 10000)} "
-        unstructured_log += f"{random.randint(100, 10000)} "
-        unstructured_log += f"{random.choice(['GET', 'POST'])} "
-        unstructured_log += f"{generate_request_uri()} "
-        unstructured_log += f"HTTP/1.1 "
-        unstructured_log += f"{generate_user_agent()} "
-        unstructured_log += f"ECDHE-RSA-AES128-GCM-SHA256 "
-        unstructured_log += f"TLSv1.2"
+def draw_int(low, high):
+    return lambda rng, n: rng.integers(low, high + 1, n).tolist()
 
-    elif service == 'NGINX':
-        unstructured_log = ""
-        unstructured_log += f"{generate_external_ip()} "
-        unstructured_log += f"- "
-        unstructured_log += f"[{datetime.utcnow().strftime('%d/%b/%Y:%H:%M:%S +0000')}] "
-        unstructured_log += f"\"{random.choice(['GET', 'POST'])} /path/to/resource HTTP/1.1\" "
-        unstructured_log += f"{random.choice([200, 301, 400, 404, 500])} "
-        unstructured_log += f"{random.randint(100, 10000)} "
-        unstructured_log += f"\"-\" "  
-        unstructured_log += f"{generate_user_agent()} "
-        unstructured_log += f"{random.random()} "
-        unstructured_log += f"{random.random()} "
-        unstructured_log += f"{random.random()} "
-        unstructured_log += f"{random.random()} "
-        unstructured_log += f"{generate_ip()}"
+def draw_choice(values):
+    table = np.array(values, dtype=object) if np is not None else None
+    return lambda rng, n: table[rng.integers(0, len(table), n)].tolist()
 
-    elif service == 'VPCFLOW':
-        ip_type = random.choice(['outbound', 'inbound'])
+def draw_sampled(sampler):
+    return sampler.draw
 
-        if ip_type == 'outbound':
-            srcaddr = generate_internal_ip()
-            dstaddr = generate_external_ip()
-        else: 
-            srcaddr = generate_external_ip()
-            dstaddr = generate_internal_ip()
+def draw_float(rng, n):
+    return rng.random(n).tolist()
+
+def draw_const(value):
+    return lambda rng, n: itertools.repeat(value, n)
+
+def draw_format(fmt, *drawers):
+    """Column of fmt.format(...) over the columns drawn by `drawers`"""
+    def draw(rng, n):
+        return [fmt.format(*values) for values in zip(*[drawer(rng, n) for drawer in drawers])]
+    return draw
+
+def format_ips(octets):
+    return [f"{a}.{b}.{c}.{d}" for a, b, c, d in octets.tolist()]
+
+def shard_octets(rng, octets):
+    """Move the third octets into this shard's SHARD_OCTETS"""
+    if SHARD_COUNT > 1:
+        octets[:, 2] = rng.integers(0, len(SHARD_OCTETS), len(octets)) * SHARD_COUNT + SHARD_INDEX
+    return octets
+
+def draw_ips(rng, n):
+    return format_ips(shard_octets(rng, rng.integers(0, 256, (n, 4))))
+
+def draw_internal_ips(rng, n):
+    octets = rng.integers(0, 256, (n, 4))
+    ranges = rng.integers(0, 3, n)
+    octets[:, 0] = np.array([10, 172, 192])[ranges]
+    octets[ranges == 1, 1] = rng.integers(16, 32, int((ranges == 1).sum()))
+    octets[ranges == 2, 1] = 168
+    return format_ips(shard_octets(rng, octets))
+
+def draw_external_ips(rng, n):
+    return format_ips(external_ip_sampler.sample_octets(rng, n))
+
+def draw_request_uris(rng, n):
+    patterns = draw_choice(REQUEST_URI_PATTERNS)(rng, n)
+    ids = request_id_sampler.draw(rng, n)
+    products = product_sampler.draw(rng, n)
+    return [pattern.format(id=id_, product=product) for pattern, id_, product in zip(patterns, ids, products)]
+
+def draw_flow_addresses(rng, n):
+    """srcaddr and dstaddr columns for a mix of outbound (internal -> external) and inbound flows"""
+    internal = draw_internal_ips(rng, n)
+    external = draw_external_ips(rng, n)
+    outbound = (rng.random(n) < 0.5).tolist()
+    srcaddr = [i if out else e for i, e, out in zip(internal, external, outbound)]
+    dstaddr = [e if out else i for i, e, out in zip(internal, external, outbound)]
+    return srcaddr, dstaddr
+
+# Field specs mirror generate_structured_log, in the same key order. A tuple of field names
+# takes one column per name from a single drawer.
+STRUCTURED_BATCH_FIELDS = {
+    'ALB': (
+        ('time', RenderTime('%Y-%m-%dT%H:%M:%SZ')),
+        ('elb', draw_format("elb_{}", draw_sampled(elb_id_sampler))),
+        ('client', draw_format("{}:443", draw_external_ips)),
+        ('target', draw_format("{}:443", draw_internal_ips)),
+        ('request_processing_time', draw_float),
+        ('target_processing_time', draw_float),
+        ('response_processing_time', draw_float),
+        ('elb_status_code', draw_sampled(status_code_sampler)),
+        ('target_status_code', draw_sampled(status_code_sampler)),
+        ('received_bytes', draw_int(100, 10000)),
+        ('sent_bytes', draw_int(100, 10000)),
+        ('request_method', draw_sampled(http_method_sampler)),
+        ('request_uri', draw_request_uris),
+        ('target_protocol', draw_const('HTTP/1.1')),
+        ('user_agent', draw_sampled(user_agent_sampler)),
+        ('ssl_cipher', draw_const('ECDHE-RSA-AES128-GCM-SHA256')),
+        ('ssl_protocol', draw_const('TLSv1.2')),
+        ('target_group_arn', draw_format("arn:aws:elasticloadbalancing:{}:{}:targetgroup/{}/{}",
+                                         draw_sampled(region_sampler),
+                                         draw_sampled(account_id_sampler),
+                                         draw_choice(['my-target-group', 'your-target-group']),
+                                         draw_sampled(target_group_id_sampler))),
+        ('trace_id', draw_format("Root={}", draw_sampled(trace_id_sampler))),
+        ('domain_name', draw_const('example.com')),
+        ('chosen_cert_arn', draw_const('arn:aws:acm:region:account-id:certificate/certificate-id')),
+        ('matched_rule_priority', draw_format("{}", draw_int(1, 100))),
+        ('request_creation_time', RenderTime('%Y-%m-%dT%H:%M:%SZ')),
+        ('actions_executed', draw_const('forward')),
+        ('redirect_url', draw_const('-')),
+        ('error_reason', draw_const('-')),
+        ('target_port_list', draw_format("{}:80", draw_ips)),
+        ('target_status_code_list', draw_format("{}", draw_sampled(status_code_sampler))),
+        ('classification', draw_const('-')),
+        ('classification_reason', draw_const('-')),
+    ),
+    'ELB': (
+        ('time', RenderTime('%Y-%m-%dT%H:%M:%SZ')),
+        ('elb', draw_format("elb_{}", draw_sampled(elb_id_sampler))),
+        ('client', draw_format("{}:80", draw_external_ips)),
+        ('backend', draw_format("{}:80", draw_internal_ips)),
+        ('request_processing_time', draw_float),
+        ('backend_processing_time', draw_float),
+        ('response_processing_time', draw_float),
+        ('elb_status_code', draw_sampled(status_code_sampler)),
+        ('backend_status_code', draw_sampled(status_code_sampler)),
+        ('received_bytes', draw_int(100, 10000)),
+        ('sent_bytes', draw_int(100, 10000)),
+        ('request_method', draw_sampled(http_method_sampler)),
+        ('request_uri', draw_request_uris),
+        ('target_protocol', draw_const('HTTP/1.1')),
+        ('user_agent', draw_sampled(user_agent_sampler)),
+        ('ssl_cipher', draw_const('ECDHE-RSA-AES128-GCM-SHA256')),
+        ('ssl_protocol', draw_const('TLSv1.2')),
+    ),
+    'NGINX': (
+        ('remote_addr', draw_external_ips),
+        ('remote_user', draw_const('-')),
+        ('time_local', RenderTime('%d/%b/%Y:%H:%M:%S +0000')),
+        ('request', draw_format("{} /path/to/resource HTTP/1.1", draw_sampled(http_method_sampler))),
+        ('status', draw_sampled(status_code_sampler)),
+        ('body_bytes_sent', draw_int(100, 10000)),
+        ('http_referer', draw_const('-')),
+        ('http_user_agent', draw_const('Mozilla/5.0 (compatible; Googlebot/2.1; +http://www.google.com/bot.html)')),
+        ('request_time', draw_float),
+        ('upstream_connect_time', draw_float),
+        ('upstream_header_time', draw_float),
+        ('upstream_response_time', draw_float),
+        ('upstream_ip', draw_ips),
+    ),
+    'VPCFLOW': (
+        ('version', draw_const(2)),
+        ('account_id', draw_const(145556732243)),
+        ('interface_id', draw_format("eni-{}", draw_sampled(interface_id_sampler))),
+        (('srcaddr', 'dstaddr'), draw_flow_addresses),
+        ('srcport', draw_int(1, 65535)),
+        ('dstport', draw_int(1, 65535)),
+        ('protocol', draw_sampled(flow_protocol_sampler)),
+        ('packets', draw_int(1, 1000)),
+        ('bytes', draw_int(40, 10000)),
+        ('start', RenderTime('%Y-%m-%dT%H:%M:%SZ')),
+        ('end', RenderTime('%Y-%m-%dT%H:%M:%SZ')),
+        ('action', draw_sampled(flow_action_sampler)),
+        ('log_status', draw_choice(['OK', 'NODATA', 'SKIPDATA'])),
+    ),
+}
+
+class StructuredBatch:
+    """n structured records for one service, drawn column-wise and rendered row by row"""
+
+    def __init__(self, service, n, rng=None):
+        if np is None:
+            raise RuntimeError("Batch generation requires numpy (pip install numpy)")
+        rng = rng if rng is not None else batch_rng
+        self.service = service
+        self.fields = []
+        self.times = {}  # format -> fields rendered with it
+        columns = []
+        for fields, drawer in STRUCTURED_BATCH_FIELDS[service]:
+            if isinstance(drawer, RenderTime):
+                self.times.setdefault(drawer.fmt, []).append(fields)
+                drawer = draw_const(None)
+            if isinstance(fields, tuple):
+                self.fields.extend(fields)
+                columns.extend(drawer(rng, n))
+            else:
+                self.fields.append(fields)
+                columns.append(drawer(rng, n))
+        self.rows = list(zip(*columns))
+
+    def __len__(self):
+        return len(self.rows)
+
+    def record(self, i):
+        record = dict(zip(self.fields, self.rows[i]))
+        for fmt, fields in self.times.items():
+            rendered = clock.format(fmt)
+            for field in fields:
+                record[field] = rendered
+        return record
+
+BATCH_SIZE = env_int('BATCH_SIZE', 0)  # structured records drawn per batch; 0 generates per record
+
+def generate_structured_batch(service, n, rng=None):
+    """n structured records for `service`, as generate_structured_log would produce them"""
+    batch = StructuredBatch(service, n, rng)
+    return [batch.record(i) for i in range(n)]
+
+class StructuredBatchPool:
+    """Hands out structured records one at a time from per-service batches of `batch_size`"""
+
+    def __init__(self, batch_size):
+        self.batch_size = batch_size
+        self.batches = {}
+
+    def next_record(self, service):
+        batch, position = self.batches.get(service, (None, 0))
+        if batch is None or position >= len(batch):
+            batch, position = StructuredBatch(service, self.batch_size), 0
+        self.batches[service] = (batch, position + 1)
+        return batch.record(position)
 
-        unstructured_log = f"2 "
-        unstructured_log += f"145556732243 "
-        unstructured_log += f"eni-{random.randint(10000000, 99999999)} "
-        unstructured_log += f"{srcaddr} "
-        unstructured_log += f"{dstaddr} "
-        unstructured_log += f"{random.randint(1, 65535)} "
-        unstructured_log += f"{random.randint(1, 65535)} "
-        unstructured_log += f"{random.choice([6, 17])} "  
-        unstructured_log += f"{random.randint(1, 1000)} "
-        unstructured_log += f"{random.randint(40, 10000)} "
-        unstructured_log += f"{datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ')} "
-        unstructured_log += f"{datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ')} "
-        unstructured_log += f"{random.choice(['ACCEPT', 'REJECT'])} "
-        unstructured_log += f"{random.choice(['OK', 'NODATA', 'SKIPDATA'])}"
-
-    return service, unstructured_log
+# Below this, drawing columns costs more per record than generating each record, for every service
+MIN_BATCH_SIZE = 64
+structured_pool = StructuredBatchPool(BATCH_SIZE) if BATCH_SIZE >= MIN_BATCH_SIZE else None
+
+# Unstructured formats are compiled once into a render function: the pattern's constant text
+# and its {slot} fields become a single positional format string, so a line is built in one
+# string-building step with one call per slot. A slot used twice in one line (VPC flow
+# start/end) is drawn once per line.
+
+def int_slot(low, high):
+    return functools.partial(rand.randrange, low, high + 1)
+
+def choice_slot(values):
+    return functools.partial(rand.choice, tuple(values))
+
+def sampled_slot(sampler):
+    return sampler.sample
+
+def utc_time_slot(fmt):
+    return functools.partial(clock.format, fmt)
+
+class RecordTemplate:
+    """A log line format compiled into constant segments plus named, typed variable slots"""
+
+    def __init__(self, pattern, **slots):
+        # The pattern becomes one positional format string with a field per distinct slot, so
+        # a line is one format() call over one draw per slot
+        segments = []
+        positions = {}
+        for literal, field, spec, conversion in string.Formatter().parse(pattern):
+            segments.append(literal.replace('{', '{{').replace('}', '}}'))
+            if field is not None:
+                if field not in slots:
+                    raise ValueError(f"Template slot {field!r} has no generator")
+                position = positions.setdefault(field, len(positions))
+                segments.append(f"{{{position}{'!' + conversion if conversion else ''}{':' + spec if spec else ''}}}")
+
+        fmt = ''.join(segments).format
+        generators = tuple(slots[field] for field in positions)
+
+        def render():
+            return fmt(*[generate() for generate in generators])
+
+        self.pattern = pattern
+        self.slots = slots
+        self.render = render
+
+def vpc_flow_addresses():
+    """Source and destination address pair for an outbound or inbound flow"""
+    if rand.random() < 0.5:
+        return f"{generate_internal_ip()} {generate_external_ip()}"
+    return f"{generate_external_ip()} {generate_internal_ip()}"
+
+UNSTRUCTURED_TEMPLATES = {
+    'ALB': RecordTemplate(
+        "{time} elb_{elb} {client}:443 {target}:443 {request_processing_time} {target_processing_time} "
+        "{response_processing_time} {elb_status_code} {target_status_code} {received_bytes} {sent_bytes} "
+        "{request_method} {request_uri} HTTP/1.1 {user_agent} ECDHE-RSA-AES128-GCM-SHA256 TLSv1.2 "
+        "arn:aws:elasticloadbalancing:{region}:{account_id}:targetgroup/{target_group}/{target_group_id} "
+        "Root={trace_id} loggoblin.com arn:aws:acm:region:account-id:certificate/certificate-id "
+        "{matched_rule_priority} {time} forward - - {target_port}:80 {target_status_code_list} - -",
+        time=utc_time_slot('%Y-%m-%dT%H:%M:%SZ'),
+        elb=sampled_slot(elb_id_sampler),
+        client=generate_external_ip,
+        target=generate_internal_ip,
+        request_processing_time=rand.random,
+        target_processing_time=rand.random,
+        response_processing_time=rand.random,
+        elb_status_code=sampled_slot(status_code_sampler),
+        target_status_code=sampled_slot(status_code_sampler),
+        received_bytes=int_slot(100, 10000),
+        sent_bytes=int_slot(100, 10000),
+        request_method=sampled_slot(http_method_sampler),
+        request_uri=generate_request_uri,
+        user_agent=generate_user_agent,
+        region=sampled_slot(region_sampler),
+        account_id=sampled_slot(account_id_sampler),
+        target_group=choice_slot(['my-target-group', 'your-target-group']),
+        target_group_id=sampled_slot(target_group_id_sampler),
+        trace_id=sampled_slot(trace_id_sampler),
+        matched_rule_priority=int_slot(1, 100),
+        target_port=generate_ip,
+        target_status_code_list=sampled_slot(status_code_sampler),
+    ),
+    'ELB': RecordTemplate(
+        "{time} elb_{elb} {client}:80 {backend}:80 {request_processing_time} {backend_processing_time} "
+        "{response_processing_time} {elb_status_code} {backend_status_code} {received_bytes} {sent_bytes} "
+        "{request_method} {request_uri} HTTP/1.1 {user_agent} ECDHE-RSA-AES128-GCM-SHA256 TLSv1.2",
+        time=utc_time_slot('%Y-%m-%dT%H:%M:%SZ'),
+        elb=sampled_slot(elb_id_sampler),
+        client=generate_internal_ip,
+        backend=generate_internal_ip,
+        request_processing_time=rand.random,
+        backend_processing_time=rand.random,
+        response_processing_time=rand.random,
+        elb_status_code=sampled_slot(status_code_sampler),
+        backend_status_code=sampled_slot(status_code_sampler),
+        received_bytes=int_slot(100, 10000),
+        sent_bytes=int_slot(100, 10000),
+        request_method=sampled_slot(http_method_sampler),
+        request_uri=generate_request_uri,
+        user_agent=generate_user_agent,
+    ),
+    'NGINX': RecordTemplate(
+        "{remote_addr} - [{time_local}] \"{request_method} /path/to/resource HTTP/1.1\" {status} {body_bytes_sent} "
+        "\"-\" {user_agent} {request_time} {upstream_connect_time} {upstream_header_time} {upstream_response_time} "
+        "{upstream_ip}",
+        remote_addr=generate_external_ip,
+        time_local=utc_time_slot('%d/%b/%Y:%H:%M:%S +0000'),
+        request_method=sampled_slot(http_method_sampler),
+        status=sampled_slot(status_code_sampler),
+        body_bytes_sent=int_slot(100, 10000),
+        user_agent=generate_user_agent,
+        request_time=rand.random,
+        upstream_connect_time=rand.random,
+        upstream_header_time=rand.random,
+        upstream_response_time=rand.random,
+        upstream_ip=generate_ip,
+    ),
+    'VPCFLOW': RecordTemplate(
+        "2 145556732243 eni-{interface_id} {addresses} {srcport} {dstport} {protocol} {packets} {bytes} "
+        "{time} {time} {action} {log_status}",
+        interface_id=sampled_slot(interface_id_sampler),
+        addresses=vpc_flow_addresses,
+        srcport=int_slot(1, 65535),
+        dstport=int_slot(1, 65535),
+        protocol=sampled_slot(flow_protocol_sampler),
+        packets=int_slot(1, 1000),
+        bytes=int_slot(40, 10000),
+        time=utc_time_slot('%Y-%m-%dT%H:%M:%SZ'),
+        action=sampled_slot(flow_action_sampler),
+        log_status=choice_slot(['OK', 'NODATA', 'SKIPDATA']),
+    ),
+}
+UNSTRUCTURED_SERVICES = tuple(UNSTRUCTURED_TEMPLATES)
+unstructured_service_sampler = AliasSampler(UNSTRUCTURED_SERVICES)
+
+def generate_unstructured_log(service=None):
+    if service is None:
+        service = unstructured_service_sampler.sample()
+    return service, UNSTRUCTURED_TEMPLATES[service].render()
 
 def generate_random_text():
     texts = [
@@ -405,14 +1931,15 @@ def generate_random_text():
         "Log entry with different format",
         "Example log message for testing"
     ]
-    return random.choice(texts)
+    return rand.choice(texts)
 
 def generate_mapping_exception():
+    timestamp = clock.now_ns() // 1_000_000
     exceptions = [
         {
             "severity": 6,
             "text": generate_random_text(),  # Expected: string, provided: string
-            "timestamp": int(time.time() * 1000)
+            "timestamp": timestamp
         },
         {
             "severity": 6,
@@ -420,19 +1947,19 @@ def generate_mapping_exception():
                 "numbers": 123456
             },  # Expected: string, provided: object
             "random_text": generate_random_text(),
-            "timestamp": int(time.time() * 1000)
+            "timestamp": timestamp
         },
         {
             "severity": 6,
             "text": 123456,  # Expected: string, provided: number
             "random_text": generate_random_text(),
-            "timestamp": int(time.time() * 1000)
+            "timestamp": timestamp
         },
         {
             "severity": 3,
             "details": "Detailed message",  # Expected: object, provided: string
             "random_text": generate_random_text(),
-            "timestamp": int(time.time() * 1000)
+            "timestamp": timestamp
         },
         {
             "severity": 4,
@@ -440,143 +1967,1566 @@ def generate_mapping_exception():
                 "info": "Detailed message"
             },  # Expected: object, provided: object
             "random_text": generate_random_text(),
-            "timestamp": int(time.time() * 1000)
+            "timestamp": timestamp
         },
         {
             "severity": 5,
             "count": "ten",  # Expected: number, provided: string
             "random_text": generate_random_text(),
-            "timestamp": int(time.time() * 1000)
+            "timestamp": timestamp
         },
         {
             "severity": 5,
             "count": 10,  # Expected: string, provided: number
             "random_text": generate_random_text(),
-            "timestamp": int(time.time() * 1000)
+            "timestamp": timestamp
         },
         {
             "severity": 2,
             "active": "yes",  # Expected: boolean, provided: string
             "random_text": generate_random_text(),
-            "timestamp": int(time.time() * 1000)
+            "timestamp": timestamp
         },
         {
             "severity": 2,
             "active": True,  # Expected: string, provided: boolean
             "random_text": generate_random_text(),
-            "timestamp": int(time.time() * 1000)
+            "timestamp": timestamp
         },
         {
             "severity": 1,
             "enabled": "true",  # Expected: boolean, provided: string
             "random_text": generate_random_text(),
-            "timestamp": int(time.time() * 1000)
+            "timestamp": timestamp
         },
         {
             "severity": 1,
             "enabled": False,  # Expected: string, provided: boolean
             "random_text": generate_random_text(),
-            "timestamp": int(time.time() * 1000)
+            "timestamp": timestamp
         },
         {
             "severity": 7,
             "created_at": "2024-06-24",  # Expected: date, provided: string
             "random_text": generate_random_text(),
-            "timestamp": int(time.time() * 1000)
+            "timestamp": timestamp
         },
         {
             "severity": 7,
-            "created_at": datetime.utcnow().isoformat(),  # Expected: string, provided: date object
+            "created_at": clock.format('%Y-%m-%dT%H:%M:%S.%f'),  # Expected: string, provided: date object
             "random_text": generate_random_text(),
-            "timestamp": int(time.time() * 1000)
+            "timestamp": timestamp
         }
     ]
-    return random.choice(exceptions)
+    return rand.choice(exceptions)
 
-def generate_logs_continuously(num_logs, sleep_interval, clear_interval):
-    last_cleared_time = time.time()
-    print("Starting log generation...", file=sys.stderr, flush=True)
-    log_count = 0
-    
-    while not stop_thread_event.is_set():
-        print(f"DEBUG: Top of while loop, generating {num_logs} logs", file=sys.stderr, flush=True)
-        for i in range(num_logs):
-            log_type = random.choice(['structured', 'unstructured', 'multiline', 'mapping_exception'])
-            print(f"DEBUG: Loop iteration {i}, log_type={log_type}", file=sys.stderr, flush=True)
-            
+# Structured generators return native dicts; this is the single stage that serializes a record
+# for the log body. JSON_ENCODER=orjson opts into the faster orjson encoder, which writes compact
+# JSON (no spaces after separators); the default keeps json.dumps output unchanged.
+JSON_ENCODER = env_choice('JSON_ENCODER', 'json', ('json', 'orjson'))
+
+def load_json_encoder(name):
+    if name == 'orjson':
+        import orjson
+        dumps = orjson.dumps
+        return lambda record: dumps(record).decode()
+    if name == 'json':
+        return json.JSONEncoder().encode
+    raise ValueError(f"Unknown JSON_ENCODER {name!r}, expected 'json' or 'orjson'")
+
+try:
+    encode_record = load_json_encoder(JSON_ENCODER)
+except ImportError:
+    setting_problems.append("JSON_ENCODER=orjson needs orjson installed (pip install orjson)")
+    JSON_ENCODER = 'json'
+    encode_record = load_json_encoder(JSON_ENCODER)
+
+# Self-metrics: counters, gauges and stage timing histograms for the generator itself, served
+# in Prometheus text format on METRICS_PORT (/metrics) and, with METRICS_OTLP=true, pushed to the
+# collector as OTLP metrics. Pool workers each serve on METRICS_PORT + worker index.
+METRICS_PORT = env_int('METRICS_PORT', 0)  # 0 disables the endpoint
+METRICS_OTLP = os.getenv('METRICS_OTLP', 'false').lower() == 'true'
+METRICS_EXPORT_INTERVAL = env_float('METRICS_EXPORT_INTERVAL', 10.0)  # seconds between OTLP metric pushes
+METRICS_ENABLED = bool(METRICS_PORT) or METRICS_OTLP
+
+# Upper bounds (seconds) of the per-record stage timing histogram buckets
+STAGE_BUCKETS = (1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 2.5e-3, 1e-2, 0.1)
+STAGES = ('generate', 'encode', 'emit')
+
+class Histogram:
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(self.bounds, seconds)] += 1
+        self.sum += seconds
+
+class GeneratorMetrics:
+    """Generator counters and gauges; written by the generation thread, read by the exporters"""
+
+    def __init__(self):
+        self.generated = collections.Counter()  # (service, log type) -> records
+        self.emitted = collections.Counter()
+        self.emitted_bytes = collections.Counter()
+        self.errors = collections.Counter()     # log type -> failed records
+        self.stages = {stage: Histogram(STAGE_BUCKETS) for stage in STAGES}
+        self.requested = 0.0
+        self.target_rate = 0.0
+        self.achieved_rate = 0.0
+        self.rate_time = time.monotonic()
+        self.rate_count = 0
+        self.import_seconds = 0.0   # set by record_startup()
+        self.startup_seconds = 0.0
+
+    def record(self, service, log_type, size, generate_seconds, encode_seconds, emit_seconds):
+        key = (service, log_type)
+        self.generated[key] += 1
+        self.emitted[key] += 1
+        self.emitted_bytes[key] += size
+        self.stages['generate'].observe(generate_seconds)
+        if encode_seconds is not None:
+            self.stages['encode'].observe(encode_seconds)
+        self.stages['emit'].observe(emit_seconds)
+
+    def record_error(self, service, log_type):
+        if service is not None:
+            self.generated[(service, log_type)] += 1
+        self.errors[log_type] += 1
+
+    def update_rate(self, bucket, log_count):
+        """Refresh the rate gauges from the generation loop, at most once per second"""
+        self.requested = bucket.requested
+        self.target_rate = bucket.rate
+        now = time.monotonic()
+        if now - self.rate_time >= 1:
+            self.achieved_rate = (log_count - self.rate_count) / (now - self.rate_time)
+            self.rate_time = now
+            self.rate_count = log_count
+
+def prometheus_labels(**labels):
+    return "{" + ",".join(f'{name}="{value}"' for name, value in labels.items()) + "}"
+
+def prometheus_histogram(lines, name, bounds, counts, total, **labels):
+    cumulative = 0
+    for bound, count in zip(bounds, counts):
+        cumulative += count
+        lines.append(f"{name}_bucket{prometheus_labels(**labels, le=bound)} {cumulative}")
+    cumulative += counts[-1]
+    lines.append(f"{name}_bucket{prometheus_labels(**labels, le='+Inf')} {cumulative}")
+    lines.append(f"{name}_sum{prometheus_labels(**labels) if labels else ''} {total}")
+    lines.append(f"{name}_count{prometheus_labels(**labels) if labels else ''} {cumulative}")
+
+def render_prometheus(metrics, export):
+    """Prometheus text exposition of the generator and export pipeline metrics"""
+    lines = []
+
+    def family(name, kind, help_text):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+
+    for name, counter, help_text in (
+            ('loggremlin_records_generated_total', metrics.generated, "Records generated, by service and log type"),
+            ('loggremlin_records_emitted_total', metrics.emitted, "Records handed to the OTLP logger, by service and log type"),
+            ('loggremlin_emitted_bytes_total', metrics.emitted_bytes, "Log body bytes emitted, by service and log type")):
+        family(name, 'counter', help_text)
+        for (service, log_type), value in sorted(counter.items()):
+            lines.append(f"{name}{prometheus_labels(service=service, log_type=log_type)} {value}")
+    family('loggremlin_emit_errors_total', 'counter', "Records that failed to generate or emit, by log type")
+    for log_type, value in sorted(metrics.errors.items()):
+        lines.append(f"loggremlin_emit_errors_total{prometheus_labels(log_type=log_type)} {value}")
+
+    family('loggremlin_records_requested_total', 'counter', "Records the rate profile asked for")
+    lines.append(f"loggremlin_records_requested_total {metrics.requested:.0f}")
+    family('loggremlin_target_rate', 'gauge', "Requested logs/sec")
+    lines.append(f"loggremlin_target_rate {metrics.target_rate}")
+    family('loggremlin_achieved_rate', 'gauge', "Emitted logs/sec over the last second")
+    lines.append(f"loggremlin_achieved_rate {metrics.achieved_rate:.1f}")
+    family('loggremlin_startup_seconds', 'gauge', "Time from the first import to importing everything, and to ready")
+    lines.append(f"loggremlin_startup_seconds{prometheus_labels(phase='import')} {metrics.import_seconds:.4f}")
+    lines.append(f"loggremlin_startup_seconds{prometheus_labels(phase='ready')} {metrics.startup_seconds:.4f}")
+
+    family('loggremlin_export_records_total', 'counter', "Export pipeline records, by outcome")
+    for name in EXPORT_COUNTER_NAMES:
+        lines.append(f"loggremlin_export_records_total{prometheus_labels(outcome=name)} {export[name]}")
+    family('loggremlin_export_queue_depth', 'gauge', "Records waiting in the export queue")
+    lines.append(f"loggremlin_export_queue_depth {export['queue_depth']}")
+    family('loggremlin_export_in_flight', 'gauge', "Records in export requests that have not completed")
+    lines.append(f"loggremlin_export_in_flight {export['in_flight']}")
+
+    family('loggremlin_stage_duration_seconds', 'histogram', "Time per record spent in each generation stage")
+    for stage, histogram in metrics.stages.items():
+        prometheus_histogram(lines, 'loggremlin_stage_duration_seconds', histogram.bounds, histogram.counts,
+                             histogram.sum, stage=stage)
+    family('loggremlin_export_request_duration_seconds', 'histogram', "Export request latency, per attempt")
+    prometheus_histogram(lines, 'loggremlin_export_request_duration_seconds',
+                         [bound / 1000 for bound in LATENCY_BUCKETS_MS], export['latency'], export['latency_seconds'])
+    return "\n".join(lines) + "\n"
+
+def start_metrics_server(port):
+    import http.server
+
+    class MetricsHandler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = render_prometheus(metrics, export_stats()).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # scrapes are not diagnostics
+
+    server = http.server.ThreadingHTTPServer(('', port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="loggremlin-metrics", daemon=True).start()
+    diag(INFO, f"Serving metrics on :{port}/metrics")
+    return server
+
+def start_otlp_metrics(worker=None):
+    """Push the same metrics to the collector every METRICS_EXPORT_INTERVAL seconds"""
+    from opentelemetry.metrics import Observation
+    from opentelemetry.sdk.metrics import MeterProvider
+    from opentelemetry.sdk.metrics.export import PeriodicExportingMetricReader
+    if EXPORT_PROTOCOL == 'http':
+        from opentelemetry.exporter.otlp.proto.http.metric_exporter import OTLPMetricExporter
+        exporter = OTLPMetricExporter(endpoint=f"http://{OTEL_HOST}:{OTEL_HTTP_PORT}/v1/metrics")
+    else:
+        from opentelemetry.exporter.otlp.proto.grpc.metric_exporter import OTLPMetricExporter
+        exporter = OTLPMetricExporter(endpoint=f"{OTEL_HOST}:{OTEL_PORT}", insecure=True)
+    attributes = {"service.name": "loggremlin"}
+    if worker is not None:
+        attributes["service.instance.id"] = f"worker-{worker}"
+    provider = MeterProvider(
+        resource=Resource.create(attributes),
+        metric_readers=[PeriodicExportingMetricReader(exporter, export_interval_millis=METRICS_EXPORT_INTERVAL * 1000)],
+    )
+    meter = provider.get_meter("loggremlin")
+
+    def by_service(counter):
+        return lambda options: [Observation(value, {"service": service, "log_type": log_type})
+                                for (service, log_type), value in list(counter.items())]
+
+    def export_counters(options):
+        counters = export_stats()
+        return [Observation(counters[name], {"outcome": name}) for name in EXPORT_COUNTER_NAMES]
+
+    def stage_percentiles(options):
+        # Observable instruments cannot carry histograms, so stage timings go out as p50/p99 gauges
+        return [Observation(latency_percentile(histogram.counts, q, STAGE_BUCKETS), {"stage": stage, "quantile": str(q)})
+                for stage, histogram in metrics.stages.items() for q in (0.5, 0.99)
+                if sum(histogram.counts) and latency_percentile(histogram.counts, q, STAGE_BUCKETS) != float('inf')]
+
+    meter.create_observable_counter("loggremlin.records.generated", [by_service(metrics.generated)])
+    meter.create_observable_counter("loggremlin.records.emitted", [by_service(metrics.emitted)])
+    meter.create_observable_counter("loggremlin.emitted.bytes", [by_service(metrics.emitted_bytes)], unit="By")
+    meter.create_observable_counter("loggremlin.emit.errors", [lambda options: [
+        Observation(value, {"log_type": log_type}) for log_type, value in list(metrics.errors.items())]])
+    meter.create_observable_counter("loggremlin.records.requested", [lambda options: [Observation(metrics.requested)]])
+    meter.create_observable_gauge("loggremlin.target_rate", [lambda options: [Observation(metrics.target_rate)]])
+    meter.create_observable_gauge("loggremlin.achieved_rate", [lambda options: [Observation(metrics.achieved_rate)]])
+    meter.create_observable_counter("loggremlin.export.records", [export_counters])
+    meter.create_observable_gauge("loggremlin.export.queue_depth", [lambda options: [Observation(export_stats()['queue_depth'])]])
+    meter.create_observable_gauge("loggremlin.stage.duration", [stage_percentiles], unit="s")
+    diag(INFO, f"Exporting metrics over OTLP every {METRICS_EXPORT_INTERVAL:g}s")
+    return provider
+
+metrics = GeneratorMetrics()
+metrics_exporters = []
+
+def start_metrics(worker=None):
+    """Start the configured metrics endpoint and exporter for this process"""
+    if METRICS_PORT:
+        metrics_exporters.append(start_metrics_server(METRICS_PORT + (worker or 0)))
+    if METRICS_OTLP:
+        metrics_exporters.append(start_otlp_metrics(worker))
+
+# Body size control: with BODY_SIZE set, each record's body is padded or truncated to a length
+# drawn from BODY_SIZE_DIST around a mean of BODY_SIZE characters, BODY_SIZE_SPREAD being the
+# standard deviation as a fraction of the mean. Padding is sliced from a block of random words
+# so it compresses like text rather than like a run of one character. JSON bodies stay valid
+# JSON: they are padded with a "padding" field and truncated by shortening their string fields,
+# longest first, then dropping fields if that is not enough. Text bodies are cut as is.
+BODY_SIZE = env_int('BODY_SIZE', 0)                              # mean body length; 0 leaves bodies as generated
+BODY_SIZE_DIST = os.getenv('BODY_SIZE_DIST', 'fixed')            # fixed | uniform | normal | lognormal | exponential
+BODY_SIZE_SPREAD = env_float('BODY_SIZE_SPREAD', 0.25)
+BODY_SIZE_MODE = env_choice('BODY_SIZE_MODE', 'both', ('pad', 'truncate', 'both'))
+
+def padding_text(length):
+    words = [''.join(rand.choices(string.ascii_lowercase, k=rand.randint(2, 10))) for _ in range(length // 4)]
+    return (' '.join(words) * 2)[:length]
+
+draw_body_size = checked_setting(
+    'BODY_SIZE_DIST', lambda: size_drawer(BODY_SIZE, BODY_SIZE_DIST, BODY_SIZE_SPREAD, 'BODY_SIZE_DIST'),
+    lambda: BODY_SIZE) if BODY_SIZE > 0 else None
+PADDING = padding_text(65536) if BODY_SIZE > 0 else ''
+# Text inserted before the closing brace of a JSON body, e.g. `, "padding": "` + filler + `"`
+JSON_PADDING_PREFIX = (', ' if JSON_ENCODER == 'json' else ',') + encode_record({'padding': ''})[1:-2]
+
+def fit_body_size(body, record=None):
+    """Pad or truncate body to the next drawn size; `record` is the dict a JSON body encodes"""
+    size = max(1, draw_body_size())
+    missing = size - len(body)
+    if missing > 0 and BODY_SIZE_MODE != 'truncate':
+        if record is not None:
+            missing -= len(JSON_PADDING_PREFIX) + 1
+            if missing <= 0:
+                return body
+            return f'{body[:-1]}{JSON_PADDING_PREFIX}{padding_filler(missing)}"}}'
+        return f"{body} {padding_filler(missing - 1)}"
+    if missing < 0 and BODY_SIZE_MODE != 'pad':
+        return body[:size] if record is None else truncate_json(record, size)
+    return body
+
+def truncate_json(record, size):
+    """`record` encoded in at most `size` characters (2 at the least, for {}) by shortening its
+    string fields, longest first, then dropping its largest fields"""
+    record = dict(record)  # the original is still emitted as the attributes
+    body = encode_record(record)
+    while len(body) > size and record:
+        excess = len(body) - size
+        strings = sorted((key for key, value in record.items() if isinstance(value, str) and value),
+                         key=lambda key: len(record[key]), reverse=True)
+        if not strings:
+            del record[max(record, key=lambda key: len(encode_record({key: record[key]})))]
+        for key in strings:
+            # A character cut shortens the encoding by at least one, more when it was escaped
+            cut = min(excess, len(record[key]))
+            record[key] = record[key][:-cut]
+            excess -= cut
+            if excess == 0:
+                break
+        body = encode_record(record)
+    return body
+
+def padding_filler(length):
+    start = rand.randrange(len(PADDING) - min(length, len(PADDING)) + 1)
+    filler = PADDING[start:start + length]
+    while len(filler) < length:
+        filler += PADDING[:length - len(filler)]
+    return filler
+
+# Request flows: one simulated request fanned out into the record each hop logs for it, all
+# carrying the same W3C trace id on the OTLP LogRecord: the ALB access log (whose X-Amzn-Trace-Id
+# is that trace id, with its first 8 hex digits being the epoch seconds as X-Ray expects), the
+# NGINX access log of the proxied request and the application's log line, plus a stack trace when
+# the request fails with a 5xx. Each hop has its own span id, parented to the hop in front of it.
+# Method, URI, status, sizes and timings are drawn once per request and shared by its records, and
+# client address, user agent and load balancer once per session, so a flow of 3-4 records costs
+# about as much as one independently generated record. Sessions last REQUEST_FLOW_SESSION_LENGTH
+# requests on average. Flow records are queued and emitted one per call, so each counts as a log.
+REQUEST_FLOW_WEIGHT = env_float('REQUEST_FLOW_WEIGHT', 0.0)                         # weight in the log type mix, the other types having 1 each
+REQUEST_FLOW_SESSION_LENGTH = env_float('REQUEST_FLOW_SESSION_LENGTH', 5.0)         # mean requests per client session
+APP_SERVICE = 'app'
+
+flow_session = None  # (client ip, user agent, session id, elb, target ip) of the current session
+pending_flow_records = collections.deque()
+
+def generate_request_flow():
+    """Records for one request as (service, log_data, body, trace_id, span_id, severity) tuples"""
+    global flow_session
+    if flow_session is None:
+        flow_session = (generate_external_ip(), generate_user_agent(), f"{rand.getrandbits(64):016x}",
+                        f"elb_{elb_id_sampler.sample()}", generate_internal_ip())
+    client_ip, user_agent, session_id, elb, target_ip = flow_session
+    if rand.random() * REQUEST_FLOW_SESSION_LENGTH < 1:
+        flow_session = None
+
+    trace_id = clock.now_ns() // 1_000_000_000 << 96 | rand.getrandbits(96)
+    trace_hex = f"{trace_id:032x}"
+    alb_span, nginx_span, app_span = rand.getrandbits(64) or 1, rand.getrandbits(64) or 1, rand.getrandbits(64) or 1
+    method = http_method_sampler.sample()
+    uri = generate_request_uri()
+    status = status_code_sampler.sample()
+    received_bytes = rand.randint(100, 10000)
+    sent_bytes = rand.randint(100, 10000)
+    # Each hop's time includes the time spent behind it
+    app_time = rand.random()
+    nginx_time = app_time + rand.random() * 0.005
+    alb_time = nginx_time + rand.random() * 0.005
+    app_ip = generate_internal_ip()
+    time_iso = clock.format('%Y-%m-%dT%H:%M:%SZ')
+    info, error = _logs.SeverityNumber.INFO, _logs.SeverityNumber.ERROR
+
+    alb = {
+        'time': time_iso,
+        'elb': elb,
+        'client': f"{client_ip}:443",
+        'target': f"{target_ip}:443",
+        'request_processing_time': alb_time - nginx_time,
+        'target_processing_time': nginx_time,
+        'response_processing_time': 0.0,
+        'elb_status_code': status,
+        'target_status_code': status,
+        'received_bytes': received_bytes,
+        'sent_bytes': sent_bytes,
+        'request_method': method,
+        'request_uri': uri,
+        'target_protocol': 'HTTP/1.1',
+        'user_agent': user_agent,
+        'ssl_cipher': 'ECDHE-RSA-AES128-GCM-SHA256',
+        'ssl_protocol': 'TLSv1.2',
+        'target_group_arn': f"arn:aws:elasticloadbalancing:{region_sampler.sample()}:{account_id_sampler.sample()}:targetgroup/my-target-group/{target_group_id_sampler.sample()}",
+        'trace_id': f"Root=1-{trace_hex[:8]}-{trace_hex[8:]}",
+        'domain_name': 'example.com',
+        'chosen_cert_arn': 'arn:aws:acm:region:account-id:certificate/certificate-id',
+        'matched_rule_priority': '1',
+        'request_creation_time': time_iso,
+        'actions_executed': 'forward',
+        'redirect_url': '-',
+        'error_reason': '-',
+        'target_port_list': f"{target_ip}:443",
+        'target_status_code_list': str(status),
+        'classification': '-',
+        'classification_reason': '-',
+    }
+    nginx = {
+        'remote_addr': client_ip,
+        'remote_user': '-',
+        'time_local': clock.format('%d/%b/%Y:%H:%M:%S +0000'),
+        'request': f"{method} {uri} HTTP/1.1",
+        'status': status,
+        'body_bytes_sent': sent_bytes,
+        'http_referer': '-',
+        'http_user_agent': user_agent,
+        'request_time': nginx_time,
+        'upstream_connect_time': 0.0,
+        'upstream_header_time': app_time,
+        'upstream_response_time': app_time,
+        'upstream_ip': app_ip,
+        'trace_id': trace_hex,
+        'span_id': f"{nginx_span:016x}",
+    }
+    app = {
+        'timestamp': clock.format('%Y-%m-%dT%H:%M:%S.%fZ'),
+        'level': 'ERROR' if status >= 500 else 'INFO',
+        'message': f"{method} {uri} completed with {status} in {app_time * 1000:.1f} ms",
+        'http_method': method,
+        'http_target': uri,
+        'http_status_code': status,
+        'duration_ms': app_time * 1000,
+        'client_ip': client_ip,
+        'session_id': session_id,
+        'trace_id': trace_hex,
+        'span_id': f"{app_span:016x}",
+        'parent_span_id': f"{nginx_span:016x}",
+    }
+    records = [
+        ('ALB', alb, None, trace_id, alb_span, info),
+        ('NGINX', nginx, None, trace_id, nginx_span, info),
+        (APP_SERVICE, app, None, trace_id, app_span, error if status >= 500 else info),
+    ]
+    if status >= 500:
+        records.append((APP_SERVICE, None, generate_multiline_log(), trace_id, app_span, error))
+    return records
+
+LOG_TYPES = ['structured', 'unstructured', 'multiline', 'mapping_exception', 'request_flow']
+log_type_sampler = AliasSampler(LOG_TYPES, [1, 1, 1, 1, REQUEST_FLOW_WEIGHT])
+
+def emit_random_log():
+    """Generate one log of a random type and emit it; returns True when the log was emitted"""
+    # The rest of a request flow goes out before anything new is drawn
+    log_type = 'request_flow' if pending_flow_records else log_type_sampler.sample()
+    clock.tick()
+    service_name = None
+    trace_id = None
+    severity = _logs.SeverityNumber.INFO
+    if METRICS_ENABLED:
+        started = time.perf_counter()
+
+    try:
+        log_data = None
+        if log_type == 'structured':
+            if structured_pool is not None:
+                service_name = structured_service_sampler.sample()
+                log_data = structured_pool.next_record(service_name)
+            else:
+                service_name, log_data = generate_structured_log()
+        elif log_type == 'unstructured':
+            service_name, body = generate_unstructured_log()
+        elif log_type == 'multiline':
+            service_name = 'multiline'
+            body = generate_multiline_log()
+        elif log_type == 'mapping_exception':
+            service_name = 'mapping_exception'
+            log_data = generate_mapping_exception()
+        elif log_type == 'request_flow':
+            if not pending_flow_records:
+                pending_flow_records.extend(generate_request_flow())
+            service_name, log_data, body, trace_id, span_id, severity = pending_flow_records.popleft()
+
+        if METRICS_ENABLED:
+            generated = time.perf_counter()
+        if log_data is not None:
+            body = encode_record(log_data)
+        if draw_body_size is not None:
+            body = fit_body_size(body, log_data)
+        if METRICS_ENABLED:
+            encoded = time.perf_counter()
+
+        logger = get_logger_for_service(service_name)
+        # Both times come from the virtual clock when it runs, or the SDK would stamp the observed
+        # time from the wall clock and seeded corpora would differ between runs
+        timestamp = clock.timestamp_ns()
+        if trace_id is None:
+            logger.emit(
+                timestamp=timestamp,
+                observed_timestamp=timestamp,
+                body=body,
+                attributes=log_data,
+                severity_number=severity
+            )
+        else:
+            logger.emit(_logs.LogRecord(
+                timestamp=timestamp,
+                observed_timestamp=timestamp,
+                trace_id=trace_id,
+                span_id=span_id,
+                trace_flags=TraceFlags(TraceFlags.SAMPLED),
+                body=body,
+                attributes=log_data,
+                severity_number=severity
+            ))
+        if METRICS_ENABLED:
+            metrics.record(service_name, log_type, len(body), generated - started,
+                           encoded - generated if log_data is not None else None, time.perf_counter() - encoded)
+        if TRACE_ENABLED:
+            diag(TRACE, f"Emitted {log_type} log for {service_name}", key='emit')
+        return True
+
+    except Exception as e:
+        if METRICS_ENABLED:
+            metrics.record_error(service_name, log_type)
+        message = f"Error emitting log: {type(e).__name__}: {e}"
+        if diag_enabled(DEBUG):
+            import traceback
+            message = f"{message}\n{traceback.format_exc().rstrip()}"
+        diag(ERROR, message, key='emit_error')
+        return False
+
+# Load engine configuration
+TARGET_RATE = env_float('TARGET_RATE', 30.0)                 # logs/sec once the profile has fully ramped
+RATE_PROFILE = env_choice('RATE_PROFILE', 'constant', ('constant', 'ramp', 'step'))
+START_RATE = env_float('START_RATE', 0.0)                    # logs/sec at the start of a ramp/step profile
+RAMP_SECONDS = env_float('RAMP_SECONDS', 60.0)               # ramp: time to climb linearly to TARGET_RATE
+STEP_RATE = env_float('STEP_RATE', 1000.0)                   # step: logs/sec added per step
+STEP_SECONDS = env_float('STEP_SECONDS', 30.0)               # step: how long each step is held
+BURST_SECONDS = env_float('BURST_SECONDS', 1.0)              # how much backlog may be caught up after a stall
+REPORT_INTERVAL = env_float('REPORT_INTERVAL', 10.0)         # seconds between achieved/requested reports
+PACING_RESOLUTION = 0.001                                    # shortest sleep; faster rates are sent in small bursts
+PACING_MAX_WAIT = 0.1                                        # longest sleep, so profile changes are picked up promptly
+
+def requested_rate(elapsed):
+    """Requested logs/sec `elapsed` seconds into the run for the scenario or RATE_PROFILE"""
+    if scenario is not None and scenario.rate is not None:
+        return scenario.rate(elapsed)
+    if RATE_PROFILE == 'ramp':
+        if elapsed >= RAMP_SECONDS:
+            return TARGET_RATE
+        return START_RATE + (TARGET_RATE - START_RATE) * elapsed / RAMP_SECONDS
+    if RATE_PROFILE == 'step':
+        return min(TARGET_RATE, START_RATE + STEP_RATE * int(elapsed // STEP_SECONDS))
+    return TARGET_RATE
+
+def shard_rate(elapsed):
+    """This shard's share of the global requested rate"""
+    return requested_rate(elapsed) / SHARD_COUNT
+
+class TokenBucket:
+    """Token-bucket pacer driven by a monotonic clock.
+
+    Tokens accrue at the requested rate for all wall time that passes, including the
+    time spent generating and emitting logs, so slow iterations are made up for on the
+    next call instead of silently lowering throughput.
+    """
+
+    def __init__(self, rate_fn, burst_seconds=BURST_SECONDS):
+        self.rate_fn = rate_fn
+        self.burst_seconds = burst_seconds
+        self.start = self.last = time.monotonic()
+        self.tokens = 0.0
+        self.rate = rate_fn(0.0)
+        self.requested = 0.0  # logs the profile asked for so far
+
+    def take(self):
+        """Refill for the time elapsed since the last call and return how many logs are due now"""
+        now = time.monotonic()
+        self.rate = self.rate_fn(now - self.start)
+        accrued = (now - self.last) * self.rate
+        self.requested += accrued
+        self.tokens = min(self.tokens + accrued, max(1.0, self.rate * self.burst_seconds))
+        self.last = now
+        due = int(self.tokens)
+        self.tokens -= due
+        return due
+
+    def wait_time(self):
+        """Seconds until the next whole token is available"""
+        if self.rate <= 0:
+            return PACING_MAX_WAIT
+        return min(max((1.0 - self.tokens) / self.rate, PACING_RESOLUTION), PACING_MAX_WAIT)
+
+# Scenario file: weights for log types, services and categorical fields, and rate phases over
+# time, read from SCENARIO_FILE (YAML, or JSON for a .json file). Weights are compiled into the
+# alias samplers above; the rate phases replace RATE_PROFILE. The file's modification time is
+# checked every SCENARIO_RELOAD_INTERVAL seconds from the generation loop, and a changed file is
+# reloaded in place. A file that fails to load is reported and the previous scenario kept.
+SCENARIO_FILE = os.getenv('SCENARIO_FILE')
+SCENARIO_RELOAD_INTERVAL = env_float('SCENARIO_RELOAD_INTERVAL', 5.0)  # 0 disables hot reload
+
+FIELD_SAMPLERS = {
+    'status_code': status_code_sampler,
+    'http_method': http_method_sampler,
+    'user_agent': user_agent_sampler,
+    'product': product_sampler,
+    'region': region_sampler,
+    'log_level': log_level_sampler,
+    'flow_protocol': flow_protocol_sampler,
+    'flow_action': flow_action_sampler,
+}
+SERVICE_SAMPLERS = {
+    'structured': structured_service_sampler,
+    'unstructured': unstructured_service_sampler,
+    'multiline': multiline_format_sampler,  # stack trace formats rather than services
+}
+
+# Cardinality budgets: FIELD_CARDINALITY="field=values[:zipf],..." (or a scenario's `cardinality`
+# section) replaces a field's values with a precomputed pool of exactly `values` distinct values,
+# drawn with Zipf skew: the k-th value has weight 1/k**zipf, so zipf=0 is uniform and zipf>1
+# concentrates traffic on a few hot keys. ID-like fields draw their pool from their usual range;
+# user agents and products extend their lists with numbered variants.
+FIELD_CARDINALITY = os.getenv('FIELD_CARDINALITY', '')
+
+CARDINALITY_SAMPLERS = {
+    'user_agent': user_agent_sampler,
+    'product': product_sampler,
+    'request_id': request_id_sampler,
+    'elb': elb_id_sampler,
+    'account_id': account_id_sampler,
+    'target_group_id': target_group_id_sampler,
+    'trace_id': trace_id_sampler,
+    'interface_id': interface_id_sampler,
+}
+
+def parse_cardinality(value):
+    """Budgets from "field=values[:zipf],..." as {field: {'values': ..., 'zipf': ...}}"""
+    budgets = {}
+    for item in filter(None, (part.strip() for part in value.split(','))):
+        field, _, budget = item.partition('=')
+        size, _, zipf = budget.partition(':')
+        budgets[field.strip()] = {'values': int(float(size)), 'zipf': float(zipf or 0)}
+    return budgets
+
+def value_pool(field, sampler, size):
+    """`size` distinct values for a field, the same in every process: a pool is drawn from its own
+    stream keyed by SEED (0 when unset) and the field, never from a worker's rand or batch_rng"""
+    if isinstance(sampler, RangeSampler):
+        low, high = sampler.full
+        rng = random.Random(f"loggremlin/cardinality/{SEED or 0}/{field}")
+        if np is None:
+            return rng.sample(range(low, high + 1), size)
+        rng = np.random.default_rng(rng.getrandbits(128))
+        span = high - low + 1
+        if size > span // 2:
+            return (rng.permutation(span)[:size] + low).tolist()
+        # Sparse in a wide range: draw with a margin for duplicates, then shuffle so rank is random
+        pool = np.empty(0, dtype=np.int64)
+        while len(pool) < size:
+            pool = np.sort(np.concatenate((pool, rng.integers(low, high + 1, size - len(pool) + size // 8 + 16))))
+            pool = pool[np.concatenate(([True], pool[1:] != pool[:-1]))]
+        return rng.permutation(pool)[:size].tolist()
+    base = sampler.defaults
+    return [base[i] if i < len(base) else f"{base[i % len(base)]} v{i // len(base)}" for i in range(size)]
+
+def check_cardinality(budgets):
+    """Validated budgets as {field: (values, zipf)}"""
+    checked = {}
+    for field, budget in budgets.items():
+        if field not in CARDINALITY_SAMPLERS:
+            raise ValueError(f"Unknown cardinality field {field!r}, expected one of {', '.join(CARDINALITY_SAMPLERS)}")
+        if not isinstance(budget, dict):
+            budget = {'values': budget}
+        size, zipf = int(budget['values']), float(budget.get('zipf', 0))
+        if size < 1 or zipf < 0:
+            raise ValueError(f"Cardinality for {field} needs values >= 1 and zipf >= 0, got {budget!r}")
+        sampler = CARDINALITY_SAMPLERS[field]
+        if isinstance(sampler, RangeSampler):
+            low, high = sampler.full
+            if size > high - low + 1:
+                raise ValueError(f"Cardinality {size} for {field} exceeds the {high - low + 1} values in its range")
+            if sampler.sharded and size < SHARD_COUNT:
+                raise ValueError(f"Cardinality {size} for {field} leaves some of the {SHARD_COUNT} shards without values")
+        checked[field] = (size, zipf)
+    return checked
+
+def apply_cardinality(budgets):
+    """Load value pools for `budgets` and drop the pools of fields no longer budgeted"""
+    for field, sampler in CARDINALITY_SAMPLERS.items():
+        budget = budgets.get(field)
+        if budget == sampler.budget:
+            continue  # unchanged, keep the pool
+        if budget is None:
+            sampler.reset()
+            continue
+        size, zipf = budget
+        pool = value_pool(field, sampler, size)
+        weights = [1 / rank ** zipf for rank in range(1, size + 1)] if zipf else None
+        if isinstance(sampler, RangeSampler) and sampler.sharded:
+            # Every shard holds the same pool and keeps every SHARD_COUNT-th value, so shards stay
+            # disjoint and together give exactly `size` values with the pool's rank weights
+            pool = pool[SHARD_INDEX::SHARD_COUNT]
+            weights = weights and weights[SHARD_INDEX::SHARD_COUNT]
+        sampler.load(pool, weights)
+        sampler.budget = budget
+
+# Pools are loaded by configure()
+env_cardinality = checked_setting('FIELD_CARDINALITY', lambda: check_cardinality(parse_cardinality(FIELD_CARDINALITY)), {})
+
+def constant_phase(rate, seconds=None):
+    return lambda offset: rate
+
+def ramp_phase(start, end, seconds):
+    return lambda offset: start + (end - start) * min(offset / seconds, 1.0)
+
+def burst_phase(rate, burst_rate, every, burst_seconds, seconds=None):
+    """burst_rate for burst_seconds at the start of every `every` seconds, rate in between"""
+    return lambda offset: burst_rate if offset % every < burst_seconds else rate
+
+def spike_phase(rate, spike_rate, at, spike_seconds, decay_seconds=0, seconds=None):
+    """One incident: spike_rate from `at` for spike_seconds, then an exponential decay back to rate"""
+    def phase_rate(offset):
+        since = offset - at
+        if since < 0:
+            return rate
+        if since < spike_seconds:
+            return spike_rate
+        if not decay_seconds:
+            return rate
+        return rate + (spike_rate - rate) * math.exp(-(since - spike_seconds) / decay_seconds)
+    return phase_rate
+
+def diurnal_phase(min_rate, max_rate, peak_hour=14, period=86400, seconds=None):
+    """Cosine day curve on wall-clock UTC time, highest at peak_hour"""
+    def phase_rate(offset):
+        angle = 2 * math.pi * ((time.time() - peak_hour * 3600) % period) / period
+        return min_rate + (max_rate - min_rate) * (1 + math.cos(angle)) / 2
+    return phase_rate
+
+RATE_PHASES = {
+    'constant': constant_phase,
+    'ramp': ramp_phase,
+    'burst': burst_phase,
+    'spike': spike_phase,
+    'diurnal': diurnal_phase,
+}
+
+class RateSchedule:
+    """Requested logs/sec from a list of consecutive phases, each `seconds` long (the last may be open)"""
+
+    def __init__(self, phases, loop=False):
+        if not phases:
+            raise ValueError("Scenario rate needs at least one phase")
+        self.starts = []
+        self.phases = []
+        start = 0.0
+        for i, phase in enumerate(phases):
+            params = dict(phase)
+            kind = params.pop('type', 'constant')
+            if kind not in RATE_PHASES:
+                raise ValueError(f"Unknown rate phase type {kind!r}, expected one of {', '.join(RATE_PHASES)}")
+            if params.get('seconds') is None and (i < len(phases) - 1 or loop):
+                raise ValueError(f"Rate phase {i + 1} ({kind}) needs 'seconds'")
+            try:
+                self.phases.append(RATE_PHASES[kind](**params))
+            except TypeError as e:
+                raise ValueError(f"Bad {kind} rate phase {phase!r}: {e}") from None
+            self.starts.append(start)
+            start += params.get('seconds') or 0
+        self.total = start if loop else None
+
+    def __call__(self, elapsed):
+        if self.total:
+            elapsed %= self.total
+        i = bisect.bisect_right(self.starts, elapsed) - 1
+        return max(0.0, self.phases[i](elapsed - self.starts[i]))
+
+def scenario_weights(sampler, weights, name, extend=False):
+    """(values, weights) for a sampler from a {value: weight} mapping.
+
+    Keys match the sampler's values by their string form, so YAML/JSON keys like "404" work.
+    With extend, unknown keys become new values of the same type as the defaults.
+    """
+    if not isinstance(weights, dict):
+        raise ValueError(f"Scenario {name} must map values to weights")
+    known = {str(value): value for value in sampler.defaults}
+    values = []
+    for key in weights:
+        if str(key) in known:
+            values.append(known[str(key)])
+        elif extend:
+            values.append(type(sampler.defaults[0])(key))
+        else:
+            raise ValueError(f"Unknown {name} {key!r}, expected one of {', '.join(known)}")
+    weights = [float(weight) for weight in weights.values()]
+    alias_tables(weights)  # validate before anything is applied
+    return values, weights
+
+class Scenario:
+    """A scenario file applied to the samplers and rate profile, reloaded when it changes"""
+
+    def __init__(self, path):
+        self.path = path
+        self.mtime = None
+        self.checked = time.monotonic()
+        self.rate = None
+
+    def read(self):
+        with open(self.path) as file:
+            if self.path.endswith('.json'):
+                return json.load(file)
             try:
-                if log_type == 'structured':
-                    print(f"DEBUG: Before generate_structured_log()", file=sys.stderr, flush=True)
-                    service_name, log_body = generate_structured_log()
-                    print(f"DEBUG: After generate, service={service_name}", file=sys.stderr, flush=True)
-                    logger = get_logger_for_service(service_name)
-                    print(f"DEBUG: Got logger", file=sys.stderr, flush=True)
-                    # Parse JSON to get attributes
-                    log_attrs = json.loads(log_body)
-                    logger.emit(
-                        body=json.dumps(log_attrs),
-                        attributes=log_attrs,
-                        severity_number=_logs.SeverityNumber.INFO
-                    )
-                    print(f"DEBUG: Emitted structured log for {service_name}", file=sys.stderr, flush=True)
-                    
-                elif log_type == 'unstructured':
-                    service_name, log_message = generate_unstructured_log()
-                    logger = get_logger_for_service(service_name)
-                    logger.emit(
-                        body=log_message,
-                        severity_number=_logs.SeverityNumber.INFO
-                    )
-                    print(f"DEBUG: Emitted unstructured log for {service_name}", file=sys.stderr, flush=True)
-                    
-                elif log_type == 'multiline':
-                    service_name = 'multiline'
-                    log_message = generate_multiline_log()
-                    logger = get_logger_for_service(service_name)
-                    logger.emit(
-                        body=log_message,
-                        severity_number=_logs.SeverityNumber.INFO
-                    )
-                    print(f"DEBUG: Emitted multiline log", file=sys.stderr, flush=True)
-                    
-                elif log_type == 'mapping_exception':
-                    service_name = 'mapping_exception'
-                    log_data = generate_mapping_exception()
-                    logger = get_logger_for_service(service_name)
-                    logger.emit(
-                        body=json.dumps(log_data),
-                        attributes=log_data,
-                        severity_number=_logs.SeverityNumber.INFO
-                    )
-                    print(f"DEBUG: Emitted mapping exception log", file=sys.stderr, flush=True)
-                    
+                import yaml
+            except ImportError:
+                raise RuntimeError(f"YAML scenario {self.path} requires PyYAML (pip install pyyaml); "
+                                   f"JSON scenarios (.json) need no extra package") from None
+            return yaml.safe_load(file) or {}
+
+    def load(self):
+        mtime = os.stat(self.path).st_mtime_ns
+        document = self.read()
+        unknown = set(document) - {'log_types', 'services', 'fields', 'cardinality', 'rate'}
+        if unknown:
+            raise ValueError(f"Unknown scenario sections: {', '.join(sorted(unknown))}")
+
+        # Compile everything first so a bad file changes nothing
+        weighted = {}
+        if 'log_types' in document:
+            weighted[log_type_sampler] = scenario_weights(log_type_sampler, document['log_types'], 'log type')
+        for kind, weights in (document.get('services') or {}).items():
+            if kind not in SERVICE_SAMPLERS:
+                raise ValueError(f"Unknown service kind {kind!r}, expected one of {', '.join(SERVICE_SAMPLERS)}")
+            weighted[SERVICE_SAMPLERS[kind]] = scenario_weights(SERVICE_SAMPLERS[kind], weights, f"{kind} service")
+        for field, weights in (document.get('fields') or {}).items():
+            if field not in FIELD_SAMPLERS:
+                raise ValueError(f"Unknown field {field!r}, expected one of {', '.join(FIELD_SAMPLERS)}")
+            weighted[FIELD_SAMPLERS[field]] = scenario_weights(FIELD_SAMPLERS[field], weights, field, extend=True)
+        cardinality = dict(env_cardinality, **check_cardinality(document.get('cardinality') or {}))
+        overlap = set(cardinality) & set(document.get('fields') or {})
+        if overlap:
+            raise ValueError(f"Fields with both weights and a cardinality budget: {', '.join(sorted(overlap))}")
+        rate = document.get('rate')
+        schedule = RateSchedule(rate.get('phases') or [], rate.get('loop', False)) if rate else None
+
+        budgeted = {CARDINALITY_SAMPLERS[field] for field in cardinality}
+        for sampler in (log_type_sampler, *SERVICE_SAMPLERS.values(), *FIELD_SAMPLERS.values()):
+            if sampler in weighted:
+                sampler.load(*weighted[sampler])
+            elif sampler not in budgeted:
+                sampler.reset()
+        apply_cardinality(cardinality)
+        self.rate = schedule
+        self.mtime = mtime
+        diag(INFO, f"Loaded scenario {self.path}: {len(weighted)} weighted samplers, "
+                   f"{len(schedule.phases) if schedule else 'no'} rate phases")
+
+    def reload_if_changed(self):
+        now = time.monotonic()
+        if not SCENARIO_RELOAD_INTERVAL or now - self.checked < SCENARIO_RELOAD_INTERVAL:
+            return
+        self.checked = now
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+            if mtime != self.mtime:
+                self.mtime = mtime  # a broken file is reported once, not on every check
+                self.load()
+        except Exception as e:
+            diag(ERROR, f"Error reloading scenario {self.path}, keeping the previous one: {type(e).__name__}: {e}",
+                 key='scenario_error')
+
+scenario = Scenario(SCENARIO_FILE) if SCENARIO_FILE else None  # loaded by configure()
+
+def reload_scenario():
+    if scenario is not None:
+        scenario.reload_if_changed()
+
+# Stats slots shared between a worker process and the pool supervisor
+STAT_EMITTED = 0
+STAT_REQUESTED = 1
+STAT_STARTED = 2  # time.monotonic() when the worker started emitting (system-wide, so comparable across workers)
+STAT_ELAPSED = 3  # seconds the worker has been emitting
+EXPORT_STAT_NAMES = ('queued', 'exported', 'dropped', 'failed', 'retried', 'queue_depth')
+STAT_EXPORT = 4  # first export counter slot, in EXPORT_STAT_NAMES order
+STAT_LATENCY = STAT_EXPORT + len(EXPORT_STAT_NAMES)  # export latency histogram, one slot per bucket
+STAT_SLOTS = STAT_LATENCY + len(LATENCY_BUCKETS_MS) + 1
+
+def format_latency(ms):
+    if ms is None:
+        return "-"
+    if ms == float('inf'):
+        return f">{LATENCY_BUCKETS_MS[-1]}ms"
+    return f"<={ms}ms"
+
+def format_export_stats(counters):
+    latency = counters['latency']
+    return (", ".join(f"{name.replace('_', ' ')} {int(counters[name])}" for name in EXPORT_STAT_NAMES)
+            + f", latency p50 {format_latency(latency_percentile(latency, 0.5))}"
+            + f" p99 {format_latency(latency_percentile(latency, 0.99))}")
+
+def publish_export_stats(stats):
+    """Copy the export counters into a pool worker's shared stats array"""
+    counters = export_stats()
+    for slot, name in enumerate(EXPORT_STAT_NAMES, STAT_EXPORT):
+        stats[slot] = counters[name]
+    stats[STAT_LATENCY:STAT_SLOTS] = counters['latency']
+
+def format_latency_histogram(latency):
+    """Non-empty buckets of the export latency histogram, for the final summary"""
+    labels = [f"<={bound}ms" for bound in LATENCY_BUCKETS_MS] + [f">{LATENCY_BUCKETS_MS[-1]}ms"]
+    return ", ".join(f"{label} {int(count)}" for label, count in zip(labels, latency) if count) or "no requests"
+
+def generate_logs_continuously(rate_fn, stop_event, stats=None):
+    """Emit logs at the rate given by rate_fn until stop_event is set.
+
+    When stats is given (a shared array written by a pool worker) the running totals are
+    published there for the supervisor to aggregate instead of being reported here.
+    Returns (emitted, requested, elapsed seconds).
+    """
+    diag(INFO, "Starting log generation...")
+    bucket = TokenBucket(rate_fn)
+    log_count = 0
+    report_count = 0
+    report_requested = 0.0
+    report_time = bucket.start
+    if stats is not None:
+        stats[STAT_STARTED] = bucket.start
+
+    while not stop_event.is_set():
+        due = bucket.take()
+        if TRACE_ENABLED:
+            diag(TRACE, f"Top of while loop, generating {due} logs", key='pacing')
+        for _ in range(due):
+            if emit_random_log():
                 log_count += 1
-                if log_count % 10 == 0:
-                    print(f"Emitted {log_count} logs so far...", file=sys.stderr, flush=True)
-                    break  # Exit inner loop to see debug output faster
-                    
-            except Exception as e:
-                print(f"Error emitting log: {type(e).__name__}: {e}", file=sys.stderr, flush=True)
-                import traceback
-                traceback.print_exc(file=sys.stderr)
-                    
-        print(f"DEBUG: Sleeping for {sleep_interval}s", file=sys.stderr, flush=True)
-        time.sleep(sleep_interval)
-        current_time = time.time()
+            if stop_event.is_set():
+                break
+        if METRICS_ENABLED:
+            metrics.update_rate(bucket, log_count)
+        reload_scenario()
 
-num_logs_per_interval = 30
-sleep_interval = 1  
-clear_interval = 180  
+        if stats is not None:
+            stats[STAT_EMITTED] = log_count
+            stats[STAT_REQUESTED] = bucket.requested
+            stats[STAT_ELAPSED] = time.monotonic() - bucket.start
+            publish_export_stats(stats)
+        else:
+            now = time.monotonic()
+            if now - report_time >= REPORT_INTERVAL:
+                achieved = (log_count - report_count) / (now - report_time)
+                requested = (bucket.requested - report_requested) / (now - report_time)
+                diag(INFO, f"Emitted {log_count} logs so far... requested {requested:.1f} logs/s, achieved {achieved:.1f} logs/s; "
+                           f"export: {format_export_stats(export_stats())}")
+                report_count = log_count
+                report_requested = bucket.requested
+                report_time = now
 
-stop_thread_event = threading.Event()
+        wait = bucket.wait_time()
+        if TRACE_ENABLED:
+            diag(TRACE, f"Sleeping for {wait:.4f}s", key='pacing')
+        stop_event.wait(wait)
 
-log_generation_thread = threading.Thread(target=generate_logs_continuously, args=(num_logs_per_interval, sleep_interval, clear_interval))
-log_generation_thread.start()
+    elapsed = time.monotonic() - bucket.start
+    if stats is not None:
+        stats[STAT_ELAPSED] = elapsed
+    if elapsed > 0:
+        diag(INFO, f"Emitted {log_count} logs in {elapsed:.1f}s: achieved {log_count / elapsed:.1f} logs/s, "
+                   f"requested {bucket.requested / elapsed:.1f} logs/s; export: {format_export_stats(export_stats())}")
+        if stats is None:
+            diag(INFO, f"Export latency: {format_latency_histogram(export_stats()['latency'])}")
+    return log_count, bucket.requested, elapsed
 
-try:
+# Worker pool configuration: 1 keeps everything on a single generation thread,
+# N > 1 (or "auto" for one per CPU) splits TARGET_RATE evenly across N processes
+WORKERS = os.getenv('WORKERS', '1')
+if WORKERS != 'auto' and not WORKERS.isdigit():
+    setting_problems.append(f"WORKERS must be an integer or 'auto', got {WORKERS!r}")
+    WORKERS = '1'
+
+def worker_count():
+    if WORKERS == 'auto':
+        return os.cpu_count() or 1
+    return max(1, int(WORKERS))
+
+def worker_rate(workers, elapsed):
+    """This worker's share of the shard's requested rate"""
+    return shard_rate(elapsed) / workers
+
+def run_worker(worker_id, workers, stop_event, stats):
+    """Pool worker entry point; runs in its own process with its own generators and provider cache"""
+    global log_record_processor
+    # The supervisor owns SIGINT/SIGTERM handling and stops workers through stop_event
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    diag(INFO, f"Worker {worker_id}/{workers} started (pid {os.getpid()})")
+    configure()  # spawned workers import the module afresh
+    seed_streams(worker_id)
+    log_record_processor = create_log_record_processor(worker_id)
+    start_metrics(worker_id)
+    record_startup()
+    generate_logs_continuously(functools.partial(worker_rate, workers), stop_event, stats)
+    shutdown_telemetry()
+    publish_export_stats(stats)
+
+def aggregate_export_stats(worker_stats):
+    counters = {name: sum(stats[slot] for stats in worker_stats)
+                for slot, name in enumerate(EXPORT_STAT_NAMES, STAT_EXPORT)}
+    counters['latency'] = [sum(stats[slot] for stats in worker_stats) for slot in range(STAT_LATENCY, STAT_SLOTS)]
+    return counters
+
+def emit_window(worker_stats):
+    """Seconds from the first worker starting to emit to the last one stopping, excluding spawn and import"""
+    running = [(stats[STAT_STARTED], stats[STAT_STARTED] + stats[STAT_ELAPSED])
+               for stats in worker_stats if stats[STAT_ELAPSED] > 0]
+    if not running:
+        return 0.0
+    return max(end for _, end in running) - min(start for start, _ in running)
+
+def run_worker_pool(workers):
+    """Start `workers` generation processes and report their aggregate throughput until stopped"""
+    ctx = multiprocessing.get_context('spawn')
+    main_module = sys.modules['__main__']
+    if getattr(main_module, '__spec__', None) is None and getattr(main_module, 'run_worker', None) is run_worker:
+        # Run as `python loggremlin.py`, spawn would re-run the script from its path in every
+        # worker, compiling it from source each time; with a module name each worker imports it
+        # through the bytecode cache, as under `python -m loggremlin`
+        import importlib.util
+        spec = importlib.util.find_spec(os.path.splitext(os.path.basename(__file__))[0])
+        if spec is not None and spec.origin == os.path.abspath(__file__):
+            main_module.__spec__ = spec
+    stop_event = ctx.Event()
+    worker_stats = [ctx.Array('d', STAT_SLOTS, lock=False) for _ in range(workers)]
+    processes = [
+        ctx.Process(target=run_worker, args=(i, workers, stop_event, worker_stats[i]), name=f"loggremlin-worker-{i}")
+        for i in range(workers)
+    ]
+    for process in processes:
+        process.start()
+
+    stopping = threading.Event()
+    install_stop_handlers(stopping)
+    start = report_time = time.monotonic()
+    report_count = 0
+    report_requested = 0.0
+    while any(process.is_alive() for process in processes) and not stopping.wait(REPORT_INTERVAL):
+        now = time.monotonic()
+        log_count = sum(stats[STAT_EMITTED] for stats in worker_stats)
+        requested_count = sum(stats[STAT_REQUESTED] for stats in worker_stats)
+        achieved = (log_count - report_count) / (now - report_time)
+        requested = (requested_count - report_requested) / (now - report_time)
+        per_worker = ", ".join(f"{int(stats[STAT_EMITTED])}" for stats in worker_stats)
+        diag(INFO, f"Emitted {int(log_count)} logs so far across {workers} workers [{per_worker}]... "
+                   f"requested {requested:.1f} logs/s, achieved {achieved:.1f} logs/s; "
+                   f"export: {format_export_stats(aggregate_export_stats(worker_stats))}")
+        report_count = log_count
+        report_requested = requested_count
+        report_time = now
+    stop_event.set()
+    running = time.monotonic() - start
+    # Workers flush within SHUTDOWN_TIMEOUT plus the exporters' grace; one more grace covers process exit
+    deadline = time.monotonic() + SHUTDOWN_TIMEOUT + 2 * SHUTDOWN_GRACE
+    for process in processes:
+        process.join(max(0.0, deadline - time.monotonic()))
+        if process.is_alive():
+            diag(WARNING, f"{process.name} did not stop within the shutdown timeout, killing it")
+            process.kill()  # workers ignore SIGTERM
+            process.join()
+    stopped = time.monotonic() - start - running
+
+    # Rates are over the workers' own emit time, not the supervisor's, which includes spawning them
+    elapsed = emit_window(worker_stats)
+    log_count = sum(stats[STAT_EMITTED] for stats in worker_stats)
+    requested_count = sum(stats[STAT_REQUESTED] for stats in worker_stats)
+    if elapsed > 0:
+        diag(INFO, f"Emitted {int(log_count)} logs across {workers} workers in {elapsed:.1f}s: "
+                   f"achieved {log_count / elapsed:.1f} logs/s, requested {requested_count / elapsed:.1f} logs/s; "
+                   f"export: {format_export_stats(aggregate_export_stats(worker_stats))}")
+        diag(INFO, f"Export latency: {format_latency_histogram(aggregate_export_stats(worker_stats)['latency'])}")
+    diag(INFO, f"Shutdown complete in {stopped:.1f}s: {format_shutdown_summary(aggregate_export_stats(worker_stats))}")
+    write_run_summary(elapsed, log_count, requested_count, aggregate_export_stats(worker_stats), workers)
+
+# Pre-generated corpus. `generate` runs the normal generators through a CorpusWriter in place
+# of the export pipeline and stores each batch exactly as it would have been exported: a
+# length-prefixed, serialized ExportLogsServiceRequest (service.name resources, attributes and
+# all) plus the offsets of its LogRecord timestamps. `replay` memory-maps the file, shifts those
+# timestamps to the send time in place and streams the bytes to the collector at TARGET_RATE,
+# so no record is generated or encoded while replaying.
+CORPUS_MAGIC = b'LGCORP1\n'
+CORPUS_FRAME = struct.Struct('<III')  # payload bytes, records, timestamp offsets
+CORPUS_TIMESTAMP = struct.Struct('<Q')
+
+def read_varint(buf, pos):
+    result = shift = 0
     while True:
-        time.sleep(1)
-except KeyboardInterrupt:
-    print("Stopping log generation...")
-    stop_thread_event.set()
-    log_generation_thread.join()
+        byte = buf[pos]
+        pos += 1
+        result |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+
+def protobuf_fields(buf, start, end):
+    """Yield (field number, wire type, value start, value end) for one serialized message"""
+    pos = start
+    while pos < end:
+        key, pos = read_varint(buf, pos)
+        field, wire_type = key >> 3, key & 7
+        if wire_type == 0:
+            _, value_end = read_varint(buf, pos)
+        elif wire_type == 1:
+            value_end = pos + 8
+        elif wire_type == 2:
+            length, pos = read_varint(buf, pos)
+            value_end = pos + length
+        elif wire_type == 5:
+            value_end = pos + 4
+        else:
+            raise ValueError(f"Unsupported protobuf wire type {wire_type}")
+        yield field, wire_type, pos, value_end
+        pos = value_end
+
+def timestamp_offsets(payload):
+    """Offsets of every LogRecord time_unix_nano / observed_time_unix_nano (fixed64) in a request"""
+    offsets = []
+    for field, _, start, end in protobuf_fields(payload, 0, len(payload)):
+        if field != 1:  # ExportLogsServiceRequest.resource_logs
+            continue
+        for field, _, start, end in protobuf_fields(payload, start, end):
+            if field != 2:  # ResourceLogs.scope_logs
+                continue
+            for field, _, start, end in protobuf_fields(payload, start, end):
+                if field != 2:  # ScopeLogs.log_records
+                    continue
+                offsets.extend(value_start for field, wire_type, value_start, _ in protobuf_fields(payload, start, end)
+                               if field in (1, 11) and wire_type == 1)
+    return offsets
+
+class CorpusWriter(LogRecordProcessor):
+    """Log record processor that writes batches to a corpus file instead of exporting them"""
+
+    def __init__(self, file, batch_size=EXPORT_BATCH_SIZE):
+        self.file = file
+        self.batch_size = batch_size
+        self.batch = []
+        self.records = 0
+        self.frames = 0
+
+    def on_emit(self, log_record):
+        self.batch.append(to_readable_log_record(log_record))
+        if len(self.batch) >= self.batch_size:
+            self.write_batch()
+
+    def write_batch(self):
+        payload = encode_batch(self.batch)
+        offsets = timestamp_offsets(payload)
+        self.file.write(CORPUS_FRAME.pack(len(payload), len(self.batch), len(offsets)))
+        self.file.write(struct.pack(f'<{len(offsets)}I', *offsets))
+        self.file.write(payload)
+        self.records += len(self.batch)
+        self.frames += 1
+        self.batch = []
+
+    def force_flush(self, timeout_millis=30000):
+        if self.batch:
+            self.write_batch()
+        return True
+
+    def shutdown(self):
+        if self.batch and not self.file.closed:
+            self.write_batch()
+
+def generate_corpus(path, records):
+    """Write `records` logs from the regular generators to a corpus file"""
+    global log_record_processor
+    diag(INFO, f"Generating {records} records into corpus {path}...")
+    seed_streams(0)
+    start = time.monotonic()
+    with open(path, 'wb') as file:
+        file.write(CORPUS_MAGIC)
+        writer = log_record_processor = CorpusWriter(file)
+        emitted = 0
+        while emitted < records:
+            if emit_random_log():
+                emitted += 1
+        writer.force_flush()
+        size = file.tell()
+    diag(INFO, f"Wrote {writer.records} records in {writer.frames} batches to {path} "
+               f"({size} bytes) in {time.monotonic() - start:.1f}s")
+
+class CorpusReplayer:
+    """Streams a corpus file's pre-encoded batches to an async transport at a paced rate"""
+
+    def __init__(self, path, transport, rate_fn=shard_rate, concurrency=EXPORT_CONCURRENCY,
+                 max_retries=EXPORT_MAX_RETRIES):
+        self.path = path
+        self.transport = transport
+        self.rate_fn = rate_fn
+        self.concurrency = max(1, concurrency)
+        self.max_retries = max_retries
+        with open(path, 'rb') as file:
+            # ACCESS_COPY maps the file copy-on-write, so timestamps are patched in memory only
+            self.corpus = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_COPY)
+        if self.corpus[:len(CORPUS_MAGIC)] != CORPUS_MAGIC:
+            raise ValueError(f"{path} is not a LogGremlin corpus")
+        self.frames = []  # (payload start, payload end, records, timestamp offsets)
+        pos = len(CORPUS_MAGIC)
+        while pos < len(self.corpus):
+            length, records, count = CORPUS_FRAME.unpack_from(self.corpus, pos)
+            pos += CORPUS_FRAME.size
+            offsets = struct.unpack_from(f'<{count}I', self.corpus, pos)
+            pos += 4 * count
+            self.frames.append((pos, pos + length, records, offsets))
+            pos += length
+        if not self.frames:
+            raise ValueError(f"{path} holds no records")
+        self.records = sum(frame[2] for frame in self.frames)
+        if np is not None:
+            # Patch with one gather/scatter per batch: byte positions of every timestamp field
+            self.corpus_bytes = np.frombuffer(self.corpus, dtype=np.uint8)
+            self.frame_positions = [np.add.outer(np.add(start, offsets, dtype=np.int64), np.arange(8))
+                                    for start, _, _, offsets in self.frames]
+        self.counters = dict.fromkeys(('sent', 'exported', 'failed', 'retried'), 0)
+        self.latency = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+
+    def patch_timestamps(self, index, now_ns):
+        """Shift a batch's timestamps so its first record is stamped now, keeping the spacing"""
+        start, _, _, offsets = self.frames[index]
+        if not offsets:
+            return
+        if np is not None:
+            positions = self.frame_positions[index]
+            timestamps = self.corpus_bytes[positions].view('<u8')
+            timestamps += np.uint64(now_ns) - timestamps[0]
+            self.corpus_bytes[positions] = timestamps.view(np.uint8)
+            return
+        corpus = self.corpus
+        shift = now_ns - CORPUS_TIMESTAMP.unpack_from(corpus, start + offsets[0])[0]
+        for offset in offsets:
+            pos = start + offset
+            CORPUS_TIMESTAMP.pack_into(corpus, pos, CORPUS_TIMESTAMP.unpack_from(corpus, pos)[0] + shift)
+
+    def record_attempt(self, records, attempt, seconds):
+        self.latency[latency_bucket(seconds)] += 1
+        if attempt:
+            self.counters['retried'] += records
+
+    async def send(self, frame, slots, stop_event):
+        start, end, records, _ = frame
+        try:
+            exported = await export_with_retries(self.transport, self.corpus[start:end], self.max_retries,
+                                                 functools.partial(self.record_attempt, records), stop_event.is_set)
+            self.counters['exported' if exported else 'failed'] += records
+        finally:
+            slots.release()
+
+    def report(self, message):
+        diag(INFO, f"{message}; exported {self.counters['exported']}, failed {self.counters['failed']}, "
+                   f"retried {self.counters['retried']}, "
+                   f"latency p50 {format_latency(latency_percentile(self.latency, 0.5))} "
+                   f"p99 {format_latency(latency_percentile(self.latency, 0.99))}")
+
+    async def run(self, stop_event):
+        diag(INFO, f"Replaying corpus {self.path} ({self.records} records in {len(self.frames)} batches) "
+                   f"to OTEL at {otlp_endpoint()} ({EXPORT_PROTOCOL}), at {describe_rate()}...")
+        await self.transport.open()
+        slots = asyncio.Semaphore(self.concurrency)
+        bucket = TokenBucket(self.rate_fn)
+        frames = itertools.cycle(range(len(self.frames)))
+        index = next(frames)
+        frame = self.frames[index]
+        tasks = set()
+        credit = 0.0
+        report_sent = 0
+        report_requested = 0.0
+        report_time = bucket.start
+
+        while not stop_event.is_set():
+            # A whole batch goes out once enough records are due; the backlog is capped like the bucket's
+            credit = min(credit + bucket.take(), max(frame[2], bucket.rate * bucket.burst_seconds))
+            if credit >= frame[2]:
+                await slots.acquire()
+                self.patch_timestamps(index, time.time_ns())
+                task = asyncio.create_task(self.send(frame, slots, stop_event))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+                self.counters['sent'] += frame[2]
+                credit -= frame[2]
+                index = next(frames)
+                frame = self.frames[index]
+            else:
+                wait = (frame[2] - credit) / bucket.rate if bucket.rate > 0 else PACING_MAX_WAIT
+                await asyncio.sleep(min(max(wait, PACING_RESOLUTION), PACING_MAX_WAIT))
+
+            reload_scenario()
+            now = time.monotonic()
+            if now - report_time >= REPORT_INTERVAL:
+                achieved = (self.counters['sent'] - report_sent) / (now - report_time)
+                requested = (bucket.requested - report_requested) / (now - report_time)
+                self.report(f"Replayed {self.counters['sent']} records so far... requested {requested:.1f} logs/s, "
+                            f"achieved {achieved:.1f} logs/s")
+                report_sent = self.counters['sent']
+                report_requested = bucket.requested
+                report_time = now
+
+        elapsed = time.monotonic() - bucket.start
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        await self.transport.close()
+        self.report(f"Replayed {self.counters['sent']} records in {elapsed:.1f}s: "
+                    f"achieved {self.counters['sent'] / elapsed:.1f} logs/s, requested {bucket.requested / elapsed:.1f} logs/s")
+        diag(INFO, f"Export latency: {format_latency_histogram(self.latency)}")
+
+# Lifecycle. SIGTERM (what Kubernetes sends on a rolling update) and SIGINT both stop generation
+# at the next record; the pacing wait is interruptible, so a stop is noticed at once. Then the
+# export pipeline and every provider are flushed and shut down in parallel, bounded by
+# SHUTDOWN_TIMEOUT overall; records still queued after it are counted as dropped. A summary of
+# emitted, flushed and dropped records is logged last. A second SIGINT (Ctrl-C) exits without
+# flushing; repeated SIGTERMs are ignored, since orchestrators escalate to SIGKILL themselves.
+SHUTDOWN_TIMEOUT = env_float('SHUTDOWN_TIMEOUT', 10.0)  # seconds to flush queued records on exit
+SHUTDOWN_GRACE = 1.0                                          # extra time for exporters to abort after the deadline
+
+def install_stop_handlers(stop_event):
+    """Make SIGTERM and SIGINT set stop_event; a second SIGINT exits immediately"""
+    def handle(signum, frame):
+        name = signal.Signals(signum).name
+        if stop_event.is_set():
+            if signum == signal.SIGINT:
+                diag(WARNING, f"Received {name} again, exiting without flushing")
+                os._exit(1)
+            return
+        diag(INFO, f"Received {name}, stopping log generation...")
+        stop_event.set()
+
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, handle)
+
+def run_until_stopped(target, *args):
+    """Run target(*args, stop_event) until it returns or a stop signal sets stop_event; returns its result"""
+    stop_event = threading.Event()
+    install_stop_handlers(stop_event)
+    return target(*args, stop_event)
+
+def shutdown_telemetry(timeout=SHUTDOWN_TIMEOUT):
+    """Flush and shut down the export pipeline and metrics providers in parallel; returns seconds taken"""
+    started = time.monotonic()
+    tasks = []
+    if log_record_processor is not None:
+        tasks.append(("log export pipeline", functools.partial(log_record_processor.shutdown, timeout * 1000)))
+    tasks.extend((f"metrics exporter {index}", exporter.shutdown) for index, exporter in enumerate(metrics_exporters))
+    threads = [threading.Thread(target=task, name=name, daemon=True) for name, task in tasks]
+    for thread in threads:
+        thread.start()
+    deadline = started + timeout + SHUTDOWN_GRACE
+    for thread in threads:
+        thread.join(max(0.0, deadline - time.monotonic()))
+    late = [thread.name for thread in threads if thread.is_alive()]
+    if late:
+        diag(WARNING, f"Shutdown timeout of {timeout:g}s passed with {', '.join(late)} still flushing")
+    # The providers share the pipeline, which is shut down by now; this only detaches their exit hooks
+    for provider, _ in logger_providers.values():
+        provider.shutdown()
+    return time.monotonic() - started
+
+def format_shutdown_summary(counters):
+    emitted = counters['queued'] + counters['dropped']
+    return (f"emitted {int(emitted)}, flushed {int(counters['exported'])}, "
+            f"dropped {int(counters['dropped'] + counters['failed'])} ({int(counters['dropped'])} with the queue full, "
+            f"{int(counters['failed'])} failed or still queued at the deadline)")
+
+# Run summaries. With SUMMARY_PATH set, a generation run writes its totals as JSON when it stops; "{shard}"
+# in the path becomes the shard index, e.g. /results/shard-{shard}.json on a shared volume.
+# `merge` turns the summaries of a sharded run, or bench.py results from each shard, into one
+# cluster-wide report. Shards run side by side, so counts and rates add up across them; for
+# bench.py results every other figure (per-record costs, latencies) is the worst shard's.
+SUMMARY_PATH = os.getenv('SUMMARY_PATH')
+
+def write_run_summary(elapsed, emitted, requested, counters, workers=1):
+    if not SUMMARY_PATH:
+        return
+    summary = {
+        'shard': SHARD_INDEX,
+        'shards': SHARD_COUNT,
+        'host': socket.gethostname(),
+        'workers': workers,
+        'elapsed_seconds': round(elapsed, 3),
+        'emitted': int(emitted),
+        'requested': round(requested, 1),
+        'export': {name: int(counters[name]) for name in EXPORT_COUNTER_NAMES},
+        'latency': [int(count) for count in counters['latency']],  # per LATENCY_BUCKETS_MS bucket, plus overflow
+    }
+    path = SUMMARY_PATH.format(shard=SHARD_INDEX)
+    with open(path, 'w') as file:
+        file.write(json.dumps(summary, indent=2) + '\n')
+    diag(INFO, f"Wrote run summary to {path}")
+
+def shard_coverage(documents):
+    """Shard count, reported and missing shard indexes of per-shard documents"""
+    shards = max(document.get('shards', 1) for document in documents)
+    reported = sorted(document.get('shard', 0) for document in documents)
+    for shard in sorted({shard for shard in reported if reported.count(shard) > 1}):
+        diag(WARNING, f"Shard {shard} is reported {reported.count(shard)} times; check SHARD_INDEX")
+    return {'shards': shards, 'reported': reported,
+            'missing': sorted(set(range(shards)) - set(reported))}
+
+def merge_run_summaries(summaries):
+    report = shard_coverage(summaries)
+    latency = [sum(counts) for counts in zip(*(summary['latency'] for summary in summaries))]
+    report.update({
+        'elapsed_seconds': max(summary['elapsed_seconds'] for summary in summaries),
+        'emitted': sum(summary['emitted'] for summary in summaries),
+        'requested': round(sum(summary['requested'] for summary in summaries), 1),
+        'achieved_rate': round(sum(summary['emitted'] / summary['elapsed_seconds']
+                                   for summary in summaries if summary['elapsed_seconds']), 1),
+        'requested_rate': round(sum(summary['requested'] / summary['elapsed_seconds']
+                                    for summary in summaries if summary['elapsed_seconds']), 1),
+        'export': {name: sum(summary['export'][name] for summary in summaries) for name in EXPORT_COUNTER_NAMES},
+        'latency_p50': format_latency(latency_percentile(latency, 0.5)),
+        'latency_p99': format_latency(latency_percentile(latency, 0.99)),
+        'latency': latency,
+    })
+    return report
+
+def merge_bench_results(results):
+    report = shard_coverage(results)
+    benchmarks = {}
+    for result in results:
+        for name, figures in result['benchmarks'].items():
+            merged = benchmarks.setdefault(name, {})
+            for key, value in figures.items():
+                if key not in merged:
+                    merged[key] = value
+                elif key.endswith('_per_sec') or key in ('exported', 'dropped'):
+                    merged[key] = round(merged[key] + value, 1)
+                else:
+                    merged[key] = max(merged[key], value)
+    report['benchmarks'] = benchmarks
+    return report
+
+def merge_results(paths, output=None):
+    """Print one cluster-wide report from per-shard run summaries or bench.py results"""
+    documents = []
+    for path in paths:
+        with open(path) as file:
+            documents.append(json.load(file))
+    kinds = {'bench' if 'benchmarks' in document else 'run' for document in documents}
+    if len(kinds) > 1:
+        raise ValueError("Cannot merge run summaries with bench.py results")
+    if kinds == {'bench'}:
+        report = merge_bench_results(documents)
+    else:
+        report = merge_run_summaries(documents)
+        diag(INFO, f"Cluster: {report['emitted']} logs from {len(report['reported'])} of {report['shards']} shards, "
+                   f"achieved {report['achieved_rate']:.1f} logs/s, requested {report['requested_rate']:.1f} logs/s; "
+                   f"exported {report['export']['exported']}, latency p50 {report['latency_p50']} p99 {report['latency_p99']}")
+    if report['missing']:
+        diag(WARNING, f"No results from shards {', '.join(map(str, report['missing']))}")
+    document = json.dumps(report, indent=2)
+    print(document)
+    if output:
+        with open(output, 'w') as file:
+            file.write(document + '\n')
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(prog='loggremlin.py', description="Generate synthetic logs and send them over OTLP. "
+                                     "Without a command, logs are generated continuously at TARGET_RATE.")
+    commands = parser.add_subparsers(dest='command')
+    generate = commands.add_parser('generate', help="write records from the generators to a corpus file")
+    generate.add_argument('corpus', help="corpus file to write")
+    generate.add_argument('records', type=int, help="number of records to generate")
+    replay = commands.add_parser('replay', help="stream a corpus file to the collector at TARGET_RATE, looping over it")
+    replay.add_argument('corpus', help="corpus file written by generate")
+    merge = commands.add_parser('merge', help="combine per-shard run summaries (SUMMARY_PATH) or bench.py results "
+                                              "into one cluster-wide report")
+    merge.add_argument('results', nargs='+', help="JSON files, one per shard")
+    merge.add_argument('--output', help="also write the report to this file")
+    return parser.parse_args(argv)
+
+def configure():
+    """Apply the configuration that has effects beyond this module: value pools, the scenario, notices.
+
+    Importing the module only defines things, so tests and benchmarks can import it freely;
+    main(), pool workers and bench.py call this once before generating. Settings that cannot
+    be read are reported here, as a ValueError naming the variable.
+    """
+    if setting_problems:
+        raise ValueError("Invalid settings: " + "; ".join(setting_problems))
+    if SEED is not None and not (CLOCK_MODE == 'virtual' and CLOCK_START):
+        diag(INFO, "SEED is set but timestamps come from the wall clock; "
+                   "set CLOCK_MODE=virtual and CLOCK_START for byte-identical records")
+    if 0 < BATCH_SIZE < MIN_BATCH_SIZE:
+        diag(WARNING, f"BATCH_SIZE={BATCH_SIZE} is below {MIN_BATCH_SIZE}, where batches are slower "
+                      f"than per-record generation; generating per record")
+    if SHARD_COUNT > 1:
+        diag(INFO, f"Shard {SHARD_INDEX} of {SHARD_COUNT}: sending 1/{SHARD_COUNT} of the requested rate")
+    # Pools have their own seeded streams, so every worker and shard loads the same ones
+    apply_cardinality(env_cardinality)
+    if scenario is not None:
+        scenario.load()
+
+def describe_rate():
+    """The requested rate in words, for the startup banners"""
+    if scenario is not None and scenario.rate is not None:
+        return f"the rate phases in {scenario.path}"
+    if RATE_PROFILE == 'constant':
+        return f"{TARGET_RATE:g} logs/s"
+    return f"a {RATE_PROFILE} profile from {START_RATE:g} to {TARGET_RATE:g} logs/s"
+
+def announce_live():
+    """Banner for live generation: where the logs go and at what rate"""
+    if SINK == 'otlp':
+        diag(INFO, f"Connecting to OTEL at {otlp_endpoint()} ({EXPORT_PROTOCOL}, {EXPORT_MODE} export), "
+                   f"generating {describe_rate()}")
+    else:
+        diag(INFO, f"Writing logs to {SINK} ({SINK_FORMAT}), generating {describe_rate()}")
+
+def record_startup():
+    """Log and export how long this process took from the first import to being ready to send"""
+    metrics.import_seconds = IMPORT_SECONDS
+    metrics.startup_seconds = time.perf_counter() - IMPORT_STARTED
+    diag(INFO, f"Ready in {metrics.startup_seconds * 1000:.0f} ms ({IMPORT_SECONDS * 1000:.0f} ms importing)")
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.command == 'merge':
+        merge_results(args.results, args.output)
+        return
+    configure()
+    if args.command == 'generate':
+        generate_corpus(args.corpus, args.records)
+    elif args.command == 'replay':
+        replayer = CorpusReplayer(args.corpus, create_async_transport())
+        record_startup()
+        run_until_stopped(lambda stop_event: asyncio.run(replayer.run(stop_event)))
+    elif worker_count() > 1:
+        announce_live()
+        run_worker_pool(worker_count())
+    else:
+        announce_live()
+        start_metrics()
+        seed_streams(0)
+        get_log_record_processor()  # load the exporter or sink now so startup time includes it
+        record_startup()
+        emitted, requested, elapsed = run_until_stopped(generate_logs_continuously, shard_rate)
+        flushed = export_stats()['exported']
+        stopped = shutdown_telemetry()
+        counters = export_stats()
+        diag(INFO, f"Shutdown complete in {stopped:.1f}s, flushing {int(counters['exported'] - flushed)} records: "
+                   f"{format_shutdown_summary(counters)}")
+        write_run_summary(elapsed, emitted, requested, counters)
+
+IMPORT_SECONDS = time.perf_counter() - IMPORT_STARTED
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+"""Stand-in OTLP logs receiver for local load tests.
+
+Accepts OTLP/gRPC and OTLP/HTTP protobuf log exports, counts the records and prints the
+received rate every interval, so LogGremlin's export path can be exercised without a
+collector. An optional per-request delay simulates a high-latency link.
+
+Usage: python otlp_receiver.py [--grpc-port 4317] [--http-port 4318] [--delay-ms 0] [--interval 5]
+"""
+import argparse
+import asyncio
+import gzip
+import time
+
+import grpc.aio
+from opentelemetry.proto.collector.logs.v1 import logs_service_pb2, logs_service_pb2_grpc
+
+class Counter:
+    def __init__(self):
+        self.requests = 0
+        self.records = 0
+
+    def add(self, request):
+        self.requests += 1
+        self.records += sum(len(scope_logs.log_records)
+                            for resource_logs in request.resource_logs
+                            for scope_logs in resource_logs.scope_logs)
+
+class LogsService(logs_service_pb2_grpc.LogsServiceServicer):
+    def __init__(self, counter, delay):
+        self.counter = counter
+        self.delay = delay
+
+    async def Export(self, request, context):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.counter.add(request)
+        return logs_service_pb2.ExportLogsServiceResponse()
+
+async def handle_http(reader, writer, counter, delay):
+    """Serve keep-alive POST /v1/logs requests on one connection"""
+    try:
+        while True:
+            request_line = await reader.readline()
+            if not request_line:
+                break
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                headers[name.strip().lower()] = value.strip()
+            body = await reader.readexactly(int(headers.get('content-length', '0')))
+            if headers.get('content-encoding') == 'gzip':
+                body = gzip.decompress(body)
+            if request_line.split()[1] == b'/v1/logs':
+                if delay:
+                    await asyncio.sleep(delay)
+                request = logs_service_pb2.ExportLogsServiceRequest()
+                request.ParseFromString(body)
+                counter.add(request)
+                response = logs_service_pb2.ExportLogsServiceResponse().SerializeToString()
+                status = b'200 OK'
+            else:
+                response = b''
+                status = b'404 Not Found'
+            writer.write(b'HTTP/1.1 ' + status + b'\r\nContent-Type: application/x-protobuf\r\n'
+                         b'Content-Length: ' + str(len(response)).encode() + b'\r\n\r\n' + response)
+            await writer.drain()
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        writer.close()
+
+async def report(counter, interval):
+    last_time = time.monotonic()
+    last_records = 0
+    while True:
+        await asyncio.sleep(interval)
+        now = time.monotonic()
+        rate = (counter.records - last_records) / (now - last_time)
+        print(f"Received {counter.records} records in {counter.requests} requests, {rate:.1f} records/s", flush=True)
+        last_time = now
+        last_records = counter.records
+
+async def serve(args):
+    counter = Counter()
+    delay = args.delay_ms / 1000
+
+    server = grpc.aio.server()
+    logs_service_pb2_grpc.add_LogsServiceServicer_to_server(LogsService(counter, delay), server)
+    server.add_insecure_port(f"{args.host}:{args.grpc_port}")
+    await server.start()
+
+    http_server = await asyncio.start_server(
+        lambda reader, writer: handle_http(reader, writer, counter, delay), args.host, args.http_port)
+    print(f"Listening for OTLP/gRPC on {args.host}:{args.grpc_port} and OTLP/HTTP on {args.host}:{args.http_port}",
+          flush=True)
+    try:
+        await report(counter, args.interval)
+    finally:
+        http_server.close()
+        await server.stop(None)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--grpc-port', type=int, default=4317)
+    parser.add_argument('--http-port', type=int, default=4318)
+    parser.add_argument('--delay-ms', type=float, default=0, help='latency added to every export request')
+    parser.add_argument('--interval', type=float, default=5, help='seconds between rate reports')
+    try:
+        asyncio.run(serve(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass